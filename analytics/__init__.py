@@ -0,0 +1,2 @@
+from analytics.export import export_table, iter_chunks, load_parts, load_table
+from analytics.stats import TradeWindow, book_statistics, get_trade_window
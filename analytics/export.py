@@ -0,0 +1,428 @@
+"""Columnar export of the trade tape and order history.
+
+Tables are read with plain column queries (no ORM hydration) in chunks and
+written as one part per chunk, so an export of millions of rows never holds
+more than ``chunk_size`` rows of Python objects at a time.
+
+Supported formats:
+
+* ``npy``     - one directory per part holding a ``<column>.npy`` file per
+                column; load with ``np.load(..., mmap_mode="r")`` for zero-copy
+                access.
+* ``arrow``   - one Arrow IPC file per part (requires pyarrow); zero-copy when
+                opened through ``pyarrow.memory_map``.
+* ``parquet`` - one Parquet file per part (requires pyarrow).
+
+Each dataset directory carries a ``_manifest.json`` with the list of parts and
+an ``(timestamp, id)`` watermark, so re-running an export only appends rows
+newer than the last one written. Trades are keyed by ``executed_at``; orders
+are keyed by ``updated_at`` because fills and cancels change existing rows -
+readers that want the current state of an order keep the last version of
+each ``id``.
+"""
+
+import argparse
+import io
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from models import Order, OrderStatus, OrderType, Trade
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+DEFAULT_CHUNK_SIZE = 100_000
+FORMATS = ("npy", "arrow", "parquet")
+MANIFEST_NAME = "_manifest.json"
+
+# Enum columns are stored as small integer codes; the code tables are written
+# to the manifest so readers can decode them.
+ENUM_CODES = {
+    "order_type": [t.value for t in OrderType],
+    "status": [s.value for s in OrderStatus],
+}
+
+TableSpec = namedtuple("TableSpec", ["name", "columns", "timestamp"])
+
+TABLES = {
+    "trades": TableSpec(
+        name="trades",
+        columns=[
+            ("id", "int64"),
+            ("order_id", "int64"),
+            ("counterparty_order_id", "int64"),
+            ("commodity_id", "int64"),
+            ("price", "float64"),
+            ("quantity", "float64"),
+            ("executed_at", "datetime64[us]"),
+        ],
+        timestamp="executed_at",
+    ),
+    "orders": TableSpec(
+        name="orders",
+        columns=[
+            ("id", "int64"),
+            ("customer_id", "int64"),
+            ("commodity_id", "int64"),
+            ("order_type", "int8"),
+            ("status", "int8"),
+            # NULL prices (stop-market, non-stop orders) are exported as NaN
+            ("price", "float64"),
+            ("stop_price", "float64"),
+            ("quantity", "float64"),
+            ("filled_quantity", "float64"),
+            ("created_at", "datetime64[us]"),
+            ("updated_at", "datetime64[us]"),
+        ],
+        timestamp="updated_at",
+    ),
+}
+
+
+def _table_query(db: Session, spec: TableSpec):
+    """Build the column query for a table, returning (query, ts_col, id_col, commodity_col)."""
+    if spec.name == "trades":
+        query = db.query(
+            Trade.id,
+            Trade.order_id,
+            Trade.counterparty_order_id,
+            Order.commodity_id,
+            Trade.price,
+            Trade.quantity,
+            Trade.executed_at,
+        ).join(Order, Order.id == Trade.order_id)
+        return query, Trade.executed_at, Trade.id, Order.commodity_id
+
+    query = db.query(
+        Order.id,
+        Order.customer_id,
+        Order.commodity_id,
+        Order.order_type,
+        Order.status,
+        Order.price,
+        Order.stop_price,
+        Order.quantity,
+        Order.filled_quantity,
+        Order.created_at,
+        Order.updated_at,
+    )
+    return query, Order.updated_at, Order.id, Order.commodity_id
+
+
+def _get_spec(table: str) -> TableSpec:
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}. Must be one of: {list(TABLES)}")
+    return TABLES[table]
+
+
+def _rows_to_columns(spec: TableSpec, rows: List[Tuple]) -> Dict[str, np.ndarray]:
+    """Convert a list of row tuples into a dict of typed column arrays."""
+    count = len(rows)
+    values = list(zip(*rows)) if rows else [()] * len(spec.columns)
+    columns = {}
+    for (name, dtype), column in zip(spec.columns, values):
+        if name in ENUM_CODES:
+            codes = {value: i for i, value in enumerate(ENUM_CODES[name])}
+            columns[name] = np.fromiter(
+                (codes[v.value] for v in column), dtype=dtype, count=count
+            )
+        else:
+            columns[name] = np.array(column, dtype=dtype)
+    return columns
+
+
+def iter_chunks(
+    db: Session,
+    table: str,
+    commodity_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield the rows of a table as dicts of column arrays, ``chunk_size`` rows at a time.
+
+    Rows are ordered by (timestamp, id). ``start`` is inclusive and ``end`` is
+    exclusive; ``after`` is a ``(timestamp, id)`` watermark and only rows
+    strictly after it are returned.
+    """
+    spec = _get_spec(table)
+    query, ts_col, id_col, commodity_col = _table_query(db, spec)
+
+    if commodity_id is not None:
+        query = query.filter(commodity_col == commodity_id)
+    if start is not None:
+        query = query.filter(ts_col >= start)
+    if end is not None:
+        query = query.filter(ts_col < end)
+    if after is not None:
+        after_ts, after_id = after
+        query = query.filter(
+            or_(ts_col > after_ts, and_(ts_col == after_ts, id_col > after_id))
+        )
+
+    rows = []
+    for row in query.order_by(ts_col, id_col).yield_per(chunk_size):
+        rows.append(tuple(row))
+        if len(rows) >= chunk_size:
+            yield _rows_to_columns(spec, rows)
+            rows = []
+    if rows:
+        yield _rows_to_columns(spec, rows)
+
+
+def _require_arrow(fmt: str):
+    if pa is None:
+        raise RuntimeError(f"The '{fmt}' format requires pyarrow to be installed")
+
+
+def _to_arrow(columns: Dict[str, np.ndarray]):
+    return pa.table({name: pa.array(values) for name, values in columns.items()})
+
+
+def _write_part(directory: str, name: str, columns: Dict[str, np.ndarray], fmt: str) -> str:
+    """Write a single chunk to disk and return the part's file or directory name."""
+    if fmt == "npy":
+        part_dir = os.path.join(directory, name)
+        os.makedirs(part_dir, exist_ok=True)
+        for column, values in columns.items():
+            np.save(os.path.join(part_dir, f"{column}.npy"), values)
+        return name
+
+    _require_arrow(fmt)
+    table = _to_arrow(columns)
+    if fmt == "arrow":
+        filename = f"{name}.arrow"
+        with pa_ipc.new_file(os.path.join(directory, filename), table.schema) as writer:
+            writer.write_table(table)
+    else:
+        filename = f"{name}.parquet"
+        pq.write_table(table, os.path.join(directory, filename))
+    return filename
+
+
+def _read_manifest(directory: str) -> Optional[Dict]:
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(directory: str, manifest: Dict):
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _to_datetime(value: np.datetime64) -> datetime:
+    return value.astype("datetime64[us]").astype(datetime)
+
+
+def export_table(
+    db: Session,
+    table: str,
+    directory: str,
+    commodity_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fmt: str = "npy",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict:
+    """Export a table to a columnar dataset directory, appending to any previous export.
+
+    Returns the updated manifest.
+    """
+    spec = _get_spec(table)
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt}. Must be one of: {list(FORMATS)}")
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        manifest = {
+            "table": table,
+            "format": fmt,
+            "commodity_id": commodity_id,
+            "columns": dict(spec.columns),
+            "codes": {k: v for k, v in ENUM_CODES.items() if k in dict(spec.columns)},
+            "parts": [],
+            "watermark": None,
+        }
+    elif (manifest["table"], manifest["format"], manifest["commodity_id"]) != (
+        table, fmt, commodity_id
+    ):
+        raise ValueError(
+            f"Dataset in {directory} holds {manifest['table']} "
+            f"(format={manifest['format']}, commodity_id={manifest['commodity_id']}) "
+            "and cannot be appended to with different settings"
+        )
+
+    after = None
+    if manifest["watermark"] is not None:
+        after = (
+            datetime.fromisoformat(manifest["watermark"]["timestamp"]),
+            manifest["watermark"]["id"],
+        )
+
+    for columns in iter_chunks(db, table, commodity_id, start, end, after, chunk_size):
+        name = f"part-{len(manifest['parts']):05d}"
+        timestamps = columns[spec.timestamp]
+        filename = _write_part(directory, name, columns, fmt)
+        manifest["parts"].append({
+            "name": filename,
+            "rows": int(len(timestamps)),
+            "min_timestamp": _to_datetime(timestamps[0]).isoformat(),
+            "max_timestamp": _to_datetime(timestamps[-1]).isoformat(),
+        })
+        manifest["watermark"] = {
+            "timestamp": _to_datetime(timestamps[-1]).isoformat(),
+            "id": int(columns["id"][-1]),
+        }
+        # Persist after every part so an interrupted export resumes cleanly
+        _write_manifest(directory, manifest)
+
+    _write_manifest(directory, manifest)
+    return manifest
+
+
+def load_parts(directory: str, mmap: bool = True) -> List[Dict[str, np.ndarray]]:
+    """Load every part of a dataset as a list of dicts of column arrays.
+
+    With ``mmap=True`` the ``npy`` and ``arrow`` formats are memory-mapped and
+    no column data is copied.
+    """
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        raise ValueError(f"No export manifest found in {directory}")
+
+    fmt = manifest["format"]
+    parts = []
+    for part in manifest["parts"]:
+        path = os.path.join(directory, part["name"])
+        if fmt == "npy":
+            parts.append({
+                column: np.load(
+                    os.path.join(path, f"{column}.npy"),
+                    mmap_mode="r" if mmap else None,
+                )
+                for column in manifest["columns"]
+            })
+            continue
+
+        _require_arrow(fmt)
+        if fmt == "arrow":
+            source = pa.memory_map(path) if mmap else pa.OSFile(path)
+            table = pa_ipc.open_file(source).read_all()
+        else:
+            table = pq.read_table(path, memory_map=mmap)
+        parts.append({
+            column: table.column(column).to_numpy()
+            for column in manifest["columns"]
+        })
+    return parts
+
+
+def load_table(directory: str) -> Dict[str, np.ndarray]:
+    """Load a whole dataset as a dict of contiguous column arrays."""
+    manifest = _read_manifest(directory)
+    parts = load_parts(directory)
+    return {
+        column: (
+            np.concatenate([part[column] for part in parts])
+            if parts else np.empty(0, dtype=dtype)
+        )
+        for column, dtype in (manifest or {}).get("columns", {}).items()
+    }
+
+
+def export_bytes(
+    db: Session,
+    table: str,
+    commodity_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fmt: str = "arrow",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[bytes, str, str]:
+    """Export a table into a single in-memory file.
+
+    Returns ``(payload, mimetype, filename)``. ``arrow`` produces an Arrow IPC
+    file with one record batch per chunk; ``npz`` produces an uncompressed
+    NumPy archive with one array per column.
+    """
+    spec = _get_spec(table)
+    chunks = iter_chunks(db, table, commodity_id, start, end, chunk_size=chunk_size)
+
+    if fmt == "arrow":
+        _require_arrow(fmt)
+        schema = _to_arrow(_rows_to_columns(spec, [])).schema
+        sink = pa.BufferOutputStream()
+        with pa_ipc.new_file(sink, schema) as writer:
+            for columns in chunks:
+                writer.write_table(_to_arrow(columns))
+        return sink.getvalue().to_pybytes(), "application/vnd.apache.arrow.file", f"{table}.arrow"
+
+    if fmt == "npz":
+        parts = list(chunks) or [_rows_to_columns(spec, [])]
+        buffer = io.BytesIO()
+        np.savez(buffer, **{
+            column: np.concatenate([part[column] for part in parts])
+            for column, _ in spec.columns
+        })
+        return buffer.getvalue(), "application/octet-stream", f"{table}.npz"
+
+    raise ValueError(f"Invalid format: {fmt}. Must be one of: ['arrow', 'npz']")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export trades or orders to a columnar dataset.")
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("directory", help="Dataset directory (created or appended to)")
+    parser.add_argument("--commodity-id", type=int, default=None)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--format", choices=FORMATS, default="npy")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        before = len((_read_manifest(args.directory) or {}).get("parts", []))
+        manifest = export_table(
+            db,
+            args.table,
+            args.directory,
+            commodity_id=args.commodity_id,
+            start=args.start,
+            end=args.end,
+            fmt=args.format,
+            chunk_size=args.chunk_size,
+        )
+    finally:
+        db.close()
+
+    new_parts = manifest["parts"][before:]
+    print(
+        f"Exported {sum(p['rows'] for p in new_parts)} {args.table} rows "
+        f"in {len(new_parts)} part(s) to {args.directory}"
+    )
+
+
+if __name__ == "__main__":
+    main()
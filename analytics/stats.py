@@ -0,0 +1,196 @@
+"""Vectorized market statistics over the trade tape.
+
+All statistics take NumPy column arrays (as produced by
+``analytics.export.iter_chunks``) and never loop over trades in Python.
+``TradeWindow`` keeps the most recent trades of one commodity in memory and
+only queries trades newer than the last one it has seen, so serving
+``/api/stats/<commodity_id>`` costs one small incremental query per request.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from analytics.export import iter_chunks
+
+# How much trade history each in-memory window retains
+STATS_WINDOW_SECONDS = int(os.getenv("STATS_WINDOW_SECONDS", 3600))
+
+
+def vwap(prices: np.ndarray, quantities: np.ndarray) -> float:
+    """Volume-weighted average price."""
+    volume = quantities.sum()
+    if volume <= 0:
+        return float("nan")
+    return float(np.dot(prices, quantities) / volume)
+
+
+def twap(prices: np.ndarray, timestamps: np.ndarray, end: Optional[np.datetime64] = None) -> float:
+    """Time-weighted average price.
+
+    Each trade price is weighted by how long it stood as the last price, up
+    to ``end`` (defaults to the last trade, which then carries no weight).
+    """
+    if len(prices) == 0:
+        return float("nan")
+    if end is None:
+        end = timestamps[-1]
+    durations = np.diff(timestamps, append=end).astype("timedelta64[us]").astype(np.float64)
+    total = durations.sum()
+    if total <= 0:
+        return float(prices.mean())
+    return float(np.dot(prices, durations) / total)
+
+
+def realized_volatility(prices: np.ndarray) -> float:
+    """Realized volatility as the square root of the summed squared log returns."""
+    if len(prices) < 2:
+        return float("nan")
+    returns = np.diff(np.log(prices))
+    return float(np.sqrt(np.dot(returns, returns)))
+
+
+def volume_profile(prices: np.ndarray, quantities: np.ndarray) -> List[Dict]:
+    """Traded volume per price level, ordered by price."""
+    levels, inverse = np.unique(prices, return_inverse=True)
+    volumes = np.bincount(inverse, weights=quantities, minlength=len(levels))
+    return [
+        {"price": float(price), "volume": float(volume)}
+        for price, volume in zip(levels, volumes)
+    ]
+
+
+def book_statistics(snapshot: Dict) -> Dict:
+    """Spread and depth statistics from an order book snapshot."""
+    bid_prices = np.array([level["price"] for level in snapshot["bids"]], dtype=np.float64)
+    bid_sizes = np.array([level["quantity"] for level in snapshot["bids"]], dtype=np.float64)
+    ask_prices = np.array([level["price"] for level in snapshot["asks"]], dtype=np.float64)
+    ask_sizes = np.array([level["quantity"] for level in snapshot["asks"]], dtype=np.float64)
+
+    best_bid = float(bid_prices.max()) if len(bid_prices) else None
+    best_ask = float(ask_prices.min()) if len(ask_prices) else None
+    bid_depth = float(bid_sizes.sum())
+    ask_depth = float(ask_sizes.sum())
+
+    spread = mid = None
+    if best_bid is not None and best_ask is not None:
+        spread = best_ask - best_bid
+        mid = (best_ask + best_bid) / 2
+
+    total_depth = bid_depth + ask_depth
+    return {
+        "best_bid": best_bid,
+        "best_ask": best_ask,
+        "spread": spread,
+        "mid_price": mid,
+        "bid_levels": int(len(bid_prices)),
+        "ask_levels": int(len(ask_prices)),
+        "bid_depth": bid_depth,
+        "ask_depth": ask_depth,
+        "imbalance": (bid_depth - ask_depth) / total_depth if total_depth else None,
+    }
+
+
+def _nullable(value: float) -> Optional[float]:
+    return None if np.isnan(value) else value
+
+
+class TradeWindow:
+    """Rolling in-memory window of the trades of one commodity."""
+
+    def __init__(self, commodity_id: int, window_seconds: int = STATS_WINDOW_SECONDS):
+        self.commodity_id = commodity_id
+        self.window_seconds = window_seconds
+        self.timestamps = np.empty(0, dtype="datetime64[us]")
+        self.prices = np.empty(0, dtype=np.float64)
+        self.quantities = np.empty(0, dtype=np.float64)
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def update(self, db: Session, now: Optional[datetime] = None):
+        """Append trades executed since the last update and drop those outside the window.
+
+        The query runs outside the lock: under ``AsyncSession.run_sync`` it
+        yields to the event loop, and another request on the same thread
+        would block on a lock it already holds. Concurrent updates may fetch
+        overlapping trades, so only those past the current watermark are
+        appended.
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.window_seconds)
+
+        with self._lock:
+            after = self.watermark
+        chunks = list(iter_chunks(
+            db, "trades", commodity_id=self.commodity_id,
+            start=cutoff if after is None else None, after=after,
+        ))
+
+        with self._lock:
+            if chunks:
+                timestamps = np.concatenate([c["executed_at"] for c in chunks])
+                ids = np.concatenate([c["id"] for c in chunks])
+                prices = np.concatenate([c["price"] for c in chunks])
+                quantities = np.concatenate([c["quantity"] for c in chunks])
+                if self.watermark != after and self.watermark is not None:
+                    # Another update got here first
+                    mark_ts = np.datetime64(self.watermark[0], "us")
+                    new = (timestamps > mark_ts) | ((timestamps == mark_ts) & (ids > self.watermark[1]))
+                    timestamps, ids, prices, quantities = (
+                        timestamps[new], ids[new], prices[new], quantities[new]
+                    )
+                if len(ids):
+                    self.timestamps = np.concatenate([self.timestamps, timestamps])
+                    self.prices = np.concatenate([self.prices, prices])
+                    self.quantities = np.concatenate([self.quantities, quantities])
+                    self.watermark = (timestamps[-1].astype(datetime), int(ids[-1]))
+
+            first = np.searchsorted(self.timestamps, np.datetime64(cutoff, "us"))
+            if first:
+                self.timestamps = self.timestamps[first:]
+                self.prices = self.prices[first:]
+                self.quantities = self.quantities[first:]
+
+    def statistics(self, window_seconds: Optional[int] = None, now: Optional[datetime] = None) -> Dict:
+        """Compute trade statistics over the last ``window_seconds`` of the window."""
+        now = np.datetime64(now or datetime.utcnow(), "us")
+        window_seconds = min(window_seconds or self.window_seconds, self.window_seconds)
+
+        with self._lock:
+            first = np.searchsorted(self.timestamps, now - np.timedelta64(window_seconds, "s"))
+            timestamps = self.timestamps[first:]
+            prices = self.prices[first:]
+            quantities = self.quantities[first:]
+
+        has_trades = len(prices) > 0
+        return {
+            "commodity_id": self.commodity_id,
+            "window_seconds": window_seconds,
+            "trade_count": int(len(prices)),
+            "volume": float(quantities.sum()),
+            "last_price": float(prices[-1]) if has_trades else None,
+            "high": float(prices.max()) if has_trades else None,
+            "low": float(prices.min()) if has_trades else None,
+            "vwap": _nullable(vwap(prices, quantities)),
+            "twap": _nullable(twap(prices, timestamps, end=now)),
+            "realized_volatility": _nullable(realized_volatility(prices)),
+            "volume_profile": volume_profile(prices, quantities),
+        }
+
+
+_windows: Dict[int, TradeWindow] = {}
+_windows_lock = threading.Lock()
+
+
+def get_trade_window(db: Session, commodity_id: int) -> TradeWindow:
+    """Return the up-to-date trade window for a commodity, creating it on first use."""
+    with _windows_lock:
+        window = _windows.get(commodity_id)
+        if window is None:
+            window = _windows[commodity_id] = TradeWindow(commodity_id)
+    window.update(db)
+    return window
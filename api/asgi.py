@@ -0,0 +1,392 @@
+"""Asyncio (ASGI) serving mode for the ``/api`` routes.
+
+Exposes the same endpoints as ``api/routes.py`` on Starlette, with database
+access through pooled async SQLAlchemy sessions, so idle polling clients
+cost a coroutine each instead of a worker thread. Reads are native async
+queries; order entry, cancels, statistics and exports run the existing
+synchronous ``OrderBook``/analytics code on the async connection through
+``AsyncSession.run_sync``, so matching behaviour is identical in both modes.
+
+Run with::
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from api.passwords import RETRY_AFTER, PasswordPoolBusy, password_pool
+from api.validators import CommodityCreate, OrderCreate
+from database.async_db import AsyncSessionLocal, async_engine
+from database.books import books
+from database.order_book import OrderBook
+from database.reference import reference
+from models import Commodity, Customer, Order, OrderStatus, OrderType, Trade
+
+
+# Matching is serialized by the per-commodity threading locks in
+# database.books, but every request here runs on the event loop thread, where
+# those locks are reentrant. Order entry and cancels for a commodity are
+# therefore also serialized per commodity among coroutines.
+_matching_locks = defaultdict(asyncio.Lock)
+
+
+def _error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def _busy(message: str) -> JSONResponse:
+    return JSONResponse(
+        {"error": message}, status_code=503, headers={"Retry-After": str(RETRY_AFTER)}
+    )
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    return data if isinstance(data, dict) else {}
+
+
+# Authentication middleware
+def authenticate(f):
+    @functools.wraps(f)
+    async def decorated(request: Request):
+        api_key = request.headers.get("X-API-Key")
+
+        if not api_key:
+            return _error("API Key required", 401)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Customer).where(Customer.api_key == api_key))
+            customer = result.scalars().first()
+
+            if not customer:
+                return _error("Invalid API Key", 401)
+
+            return await f(request, db, customer)
+
+    return decorated
+
+
+async def health(request: Request):
+    """Report readiness and warm-up timings (no authentication)."""
+    from database.warmup import status
+
+    result = status()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+
+async def login(request: Request):
+    """Login with username and password."""
+    data = await _json_body(request)
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        return _error("Email and password required", 400)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Customer).where(Customer.email == email))
+        customer = result.scalars().first()
+
+        # Password hashing is CPU-bound; it runs on the password pool
+        try:
+            valid = customer is not None and await password_pool.check_async(
+                customer.password_hash, password
+            )
+        except PasswordPoolBusy as e:
+            return _busy(str(e))
+
+        if not valid:
+            return _error("Invalid email or password", 401)
+
+        return JSONResponse({"customer": customer.to_dict(), "api_key": customer.api_key})
+
+
+async def create_customer(request: Request):
+    """Create a new customer."""
+    data = await _json_body(request)
+
+    # Check if password is provided
+    if "password" not in data:
+        return _error("Password required", 400)
+
+    try:
+        password_hash = await password_pool.hash_async(data.get("password"))
+    except PasswordPoolBusy as e:
+        return _busy(str(e))
+    except Exception as e:
+        logging.error("Registration error: %s", str(e))
+        return _error(f"Registration failed: {str(e)}", 400)
+
+    # Generate API key
+    api_key = str(uuid.uuid4())
+
+    async with AsyncSessionLocal() as db:
+        try:
+            customer = Customer(
+                name=data.get("name"),
+                email=data.get("email"),
+                api_key=api_key,
+                password_hash=password_hash,
+            )
+            db.add(customer)
+            await db.commit()
+            await db.refresh(customer)
+            reference.add_customer(customer)
+
+            result = customer.to_dict()
+            result["api_key"] = api_key  # Include API key in response
+            return JSONResponse(result, status_code=201)
+        except Exception as e:
+            await db.rollback()
+            logging.error("Registration error: %s", str(e))
+            return _error(f"Registration failed: {str(e)}", 400)
+
+
+@authenticate
+async def get_customer(request, db, customer):
+    """Get current customer information."""
+    payload = await db.run_sync(lambda s: reference.customer(s, customer.id))
+    return Response(payload, media_type="application/json")
+
+
+async def customers(request: Request):
+    if request.method == "POST":
+        return await create_customer(request)
+    return await get_customer(request)
+
+
+@authenticate
+async def commodity_list(request, db, customer):
+    if request.method == "GET":
+        payload = await db.run_sync(reference.commodity_list)
+        return Response(payload, media_type="application/json")
+
+    try:
+        commodity_data = CommodityCreate(**await _json_body(request))
+    except ValidationError as e:
+        return _error(str(e), 400)
+
+    commodity = Commodity(
+        name=commodity_data.name,
+        symbol=commodity_data.symbol,
+        description=commodity_data.description,
+    )
+    db.add(commodity)
+    await db.commit()
+    await db.refresh(commodity)
+    reference.invalidate_commodities()
+    return JSONResponse(commodity.to_dict(), status_code=201)
+
+
+@authenticate
+async def commodity_detail(request, db, customer):
+    commodity_id = request.path_params["commodity_id"]
+    payload = await db.run_sync(lambda s: reference.commodity(s, commodity_id))
+
+    if payload is None:
+        return _error(f"Commodity with ID {commodity_id} not found", 404)
+
+    return Response(payload, media_type="application/json")
+
+
+@authenticate
+async def order_book(request, db, customer):
+    commodity_id = request.path_params["commodity_id"]
+    snapshot = await db.run_sync(lambda s: OrderBook(s).get_order_book_snapshot(commodity_id))
+    return JSONResponse(snapshot)
+
+
+@authenticate
+async def order_book_updates(request, db, customer):
+    commodity_id = request.path_params["commodity_id"]
+    since = request.query_params.get("since")
+    level = request.query_params.get("level")
+    try:
+        since = int(since) if since is not None else None
+        level = int(level) if level is not None else None
+    except ValueError:
+        return _error("since and level must be integers", 400)
+    if level not in (None, 2, 3):
+        return _error("level must be 2 or 3", 400)
+
+    if books.get(commodity_id) is None:
+        if await db.run_sync(lambda s: books.get_or_load(s, commodity_id)) is None:
+            return _error(f"Commodity with ID {commodity_id} not found", 404)
+    return JSONResponse(books.updates(commodity_id, since, level))
+
+
+@authenticate
+async def order_list(request, db, customer):
+    if request.method == "GET":
+        result = await db.execute(select(Order).where(Order.customer_id == customer.id))
+        return JSONResponse([o.to_dict() for o in result.scalars()])
+
+    data = await _json_body(request)
+    # Override customer_id with authenticated customer
+    data["customer_id"] = customer.id
+    try:
+        order_data = OrderCreate(**data)
+    except ValidationError as e:
+        return _error(str(e), 400)
+
+    order = Order(
+        customer_id=order_data.customer_id,
+        commodity_id=order_data.commodity_id,
+        order_type=OrderType(order_data.order_type),
+        price=order_data.price,
+        stop_price=order_data.stop_price,
+        quantity=order_data.quantity,
+        filled_quantity=0.0,
+        status=OrderStatus.OPEN,
+    )
+
+    def add_order(session):
+        order_result, trades = OrderBook(session).add_order(order)
+        return {
+            "order": order_result.to_dict(),
+            "trades": [t.to_dict() for t in trades],
+        }
+
+    async with _matching_locks[order.commodity_id]:
+        result = await db.run_sync(add_order)
+    return JSONResponse(result, status_code=201)
+
+
+@authenticate
+async def order_detail(request, db, customer):
+    order_id = request.path_params["order_id"]
+    result = await db.execute(
+        select(Order).where(Order.id == order_id, Order.customer_id == customer.id)
+    )
+    order = result.scalars().first()
+
+    if not order:
+        return _error(f"Order with ID {order_id} not found", 404)
+
+    if request.method == "GET":
+        return JSONResponse(order.to_dict())
+
+    # Cancel order
+    try:
+        async with _matching_locks[order.commodity_id]:
+            cancelled = await db.run_sync(lambda s: OrderBook(s).cancel_order(order_id).to_dict())
+        return JSONResponse(cancelled)
+    except ValueError as e:
+        logging.error("Order cancellation error: %s", str(e))
+        return _error(str(e), 400)
+
+
+@authenticate
+async def trade_list(request, db, customer):
+    customer_orders = select(Order.id).where(Order.customer_id == customer.id)
+    result = await db.execute(
+        select(Trade).where(
+            or_(Trade.order_id.in_(customer_orders), Trade.counterparty_order_id.in_(customer_orders))
+        )
+    )
+    return JSONResponse([t.to_dict() for t in result.scalars()])
+
+
+@authenticate
+async def stats(request, db, customer):
+    from analytics.stats import book_statistics, get_trade_window
+
+    commodity_id = request.path_params["commodity_id"]
+    window_seconds = request.query_params.get("window")
+    try:
+        window_seconds = int(window_seconds) if window_seconds is not None else None
+    except ValueError:
+        return _error("window must be an integer", 400)
+    if window_seconds is not None and window_seconds <= 0:
+        return _error("window must be greater than zero", 400)
+
+    def compute(session):
+        # Trade windows are kept per commodity, so only for real ones
+        if reference.commodity(session, commodity_id) is None:
+            return None
+        result = get_trade_window(session, commodity_id).statistics(window_seconds)
+        result["book"] = book_statistics(OrderBook(session).get_order_book_snapshot(commodity_id))
+        return result
+
+    result = await db.run_sync(compute)
+    if result is None:
+        return _error(f"Commodity with ID {commodity_id} not found", 404)
+    return JSONResponse(result)
+
+
+@authenticate
+async def trade_export(request, db, customer):
+    from analytics.export import export_bytes
+
+    commodity_id = request.path_params["commodity_id"]
+    fmt = request.query_params.get("format", "arrow")
+    start = request.query_params.get("start")
+    end = request.query_params.get("end")
+    try:
+        payload, mimetype, filename = await db.run_sync(lambda s: export_bytes(
+            s,
+            "trades",
+            commodity_id=commodity_id,
+            start=datetime.fromisoformat(start) if start else None,
+            end=datetime.fromisoformat(end) if end else None,
+            fmt=fmt,
+        ))
+    except (ValueError, RuntimeError) as e:
+        logging.error("Trade export error: %s", str(e))
+        return _error(str(e), 400)
+
+    return Response(
+        payload,
+        media_type=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+routes = [
+    Route("/api/health", health),
+    Route("/api/login", login, methods=["POST"]),
+    Route("/api/customers", customers, methods=["GET", "POST"]),
+    Route("/api/commodities", commodity_list, methods=["GET", "POST"]),
+    Route("/api/commodities/{commodity_id:int}", commodity_detail),
+    Route("/api/orderbook/{commodity_id:int}", order_book),
+    Route("/api/orderbook/{commodity_id:int}/updates", order_book_updates),
+    Route("/api/orders", order_list, methods=["GET", "POST"]),
+    Route("/api/orders/{order_id:int}", order_detail, methods=["GET", "DELETE"]),
+    Route("/api/trades", trade_list),
+    Route("/api/stats/{commodity_id:int}", stats),
+    Route("/api/export/trades/{commodity_id:int}", trade_export),
+]
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    from database.warmup import warm_up
+
+    # Warm-up is synchronous (create_all and the book load); run it in a
+    # worker thread rather than on the event loop
+    await run_in_threadpool(warm_up)
+    yield
+    await async_engine.dispose()
+    password_pool.shutdown()
+
+
+def create_app() -> Starlette:
+    """Create the ASGI application."""
+    return Starlette(routes=routes, lifespan=lifespan)
@@ -0,0 +1,135 @@
+"""Password hashing on a bounded worker pool, off the request threads.
+
+Password hashes are deliberately slow (PBKDF2 with hundreds of thousands of
+iterations), so a burst of logins or registrations would otherwise take CPU
+from order entry on the same workers. Hashing runs instead on a pool of
+``HASH_WORKERS`` processes started at lowered scheduling priority
+(``HASH_NICE``). At most ``HASH_QUEUE_LIMIT`` hashes may be running or queued
+per server process; beyond that ``PasswordPoolBusy`` is raised and the API
+answers 503 with a ``Retry-After`` header instead of queueing without bound.
+
+``HASH_WORKERS=0`` hashes inline on the calling thread, as before.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 1))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", 4))
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", 10))
+HASH_NICE = int(os.getenv("HASH_NICE", 10))
+
+# Seconds suggested to clients that were turned away
+RETRY_AFTER = 1
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+def _lower_priority(increment: int):
+    if increment and hasattr(os, "nice"):
+        os.nice(increment)
+
+
+class PasswordPool:
+    """Bounded pool for password hashing and verification."""
+
+    def __init__(
+        self,
+        workers: int = HASH_WORKERS,
+        queue_limit: int = HASH_QUEUE_LIMIT,
+        timeout: float = HASH_TIMEOUT,
+        nice: int = HASH_NICE,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.nice = nice
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # A pool inherited across fork (e.g. from a preloading master) is unusable
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        # spawn: never fork a multi-threaded server process
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_lower_priority,
+                        initargs=(self.nice,),
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue ``fn(*args)`` on the pool, or raise ``PasswordPoolBusy``."""
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy("Too many password operations in progress, retry later")
+        try:
+            if self.workers <= 0:
+                future = Future()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future):
+        self._slots.release()
+        # A worker died; start a fresh pool on the next call
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            with self._lock:
+                self._executor = None
+
+    def run(self, fn: Callable, *args):
+        """Run ``fn(*args)`` on the pool and wait for the result."""
+        try:
+            return self.submit(fn, *args).result(self.timeout)
+        except FutureTimeoutError:
+            raise PasswordPoolBusy("Password operation timed out, retry later")
+
+    async def run_async(self, fn: Callable, *args):
+        """Awaitable ``run`` for the ASGI app."""
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.submit(fn, *args)), self.timeout)
+        except asyncio.TimeoutError:
+            raise PasswordPoolBusy("Password operation timed out, retry later")
+
+    def hash(self, password: str) -> str:
+        return self.run(generate_password_hash, password)
+
+    def check(self, password_hash: str, password: str) -> bool:
+        return self.run(check_password_hash, password_hash, password)
+
+    async def hash_async(self, password: str) -> str:
+        return await self.run_async(generate_password_hash, password)
+
+    async def check_async(self, password_hash: str, password: str) -> bool:
+        return await self.run_async(check_password_hash, password_hash, password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_pool = PasswordPool()
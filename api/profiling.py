@@ -0,0 +1,222 @@
+"""Opt-in sampled request profiling for the Flask app.
+
+Set ``PROFILE_SAMPLE_RATE`` to a fraction of requests (e.g. ``0.05``) to
+profile. Each sampled request runs under cProfile and records the SQL
+statements it executed; the ``PROFILE_TOP`` most expensive functions by
+cumulative time and the statements are kept in a buffer of the last
+``PROFILE_BUFFER`` profiles per endpoint and served at
+``GET /api/debug/profiles``. ``PROFILE_ENDPOINTS`` restricts sampling to a
+comma separated list of endpoint names (e.g. ``api.orderlistresource``).
+
+Profiles expose SQL, file paths and timings, so the debug endpoint is for
+operators only: it is registered only when ``PROFILE_DEBUG_KEY`` is set and
+requires that key in an ``X-Debug-Key`` header. Customer API keys do not
+grant access.
+
+With the sample rate unset or zero nothing is registered: no request hooks,
+no SQLAlchemy event listeners and no debug endpoint.
+
+Only one request is profiled at a time; a request picked while another is
+being profiled is skipped. Requests that match no route are never sampled,
+so probing random URLs cannot grow the buffers. Query parameters are never
+recorded.
+"""
+
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import Flask, g, request
+from sqlalchemy import event
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_BUFFER = int(os.getenv("PROFILE_BUFFER", 20))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", 25))
+PROFILE_ENDPOINTS = [e for e in os.getenv("PROFILE_ENDPOINTS", "").split(",") if e]
+PROFILE_DEBUG_KEY = os.getenv("PROFILE_DEBUG_KEY", "")
+
+# Longest SQL statement kept, in characters
+MAX_STATEMENT_LENGTH = 2000
+
+
+class ProfileStore:
+    """Bounded buffers of request profiles, one per endpoint."""
+
+    def __init__(self, size: int = PROFILE_BUFFER):
+        self.size = size
+        self._profiles: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict):
+        with self._lock:
+            buffer = self._profiles.get(profile["endpoint"])
+            if buffer is None:
+                buffer = self._profiles[profile["endpoint"]] = deque(maxlen=self.size)
+            buffer.append(profile)
+
+    def get(self, endpoint: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """Profiles by endpoint, newest first."""
+        with self._lock:
+            return {
+                name: list(reversed(buffer))
+                for name, buffer in self._profiles.items()
+                if endpoint is None or name == endpoint
+            }
+
+    def clear(self):
+        with self._lock:
+            self._profiles = {}
+
+
+class Profiler:
+    """Request hooks that profile a sample of requests."""
+
+    def __init__(
+        self,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        endpoints: Optional[List[str]] = None,
+        top: int = PROFILE_TOP,
+        store: Optional[ProfileStore] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.endpoints = set(endpoints or PROFILE_ENDPOINTS)
+        self.top = top
+        self.store = store or ProfileStore()
+        # cProfile hooks are per thread, but only one profiler may be active
+        # at a time from Python 3.12 on; this also bounds the overhead
+        self._active = threading.Lock()
+        self._local = threading.local()
+
+    # Flask hooks
+
+    def before_request(self):
+        if request.endpoint is None or request.endpoint == "debug_profiles":
+            return
+        if self.endpoints and request.endpoint not in self.endpoints:
+            return
+        if random.random() >= self.sample_rate:
+            return
+        if not self._active.acquire(blocking=False):
+            return
+        capture = {
+            "started_at": datetime.utcnow().isoformat(),
+            "sql": [],
+            "status": None,
+            "profiler": cProfile.Profile(),
+            "start": time.perf_counter(),
+        }
+        g._profile = capture
+        self._local.capture = capture
+        capture["profiler"].enable()
+
+    def after_request(self, response):
+        capture = g.get("_profile")
+        if capture is not None:
+            capture["status"] = response.status_code
+        return response
+
+    def teardown_request(self, exc):
+        capture = g.pop("_profile", None)
+        if capture is None:
+            return
+        try:
+            capture["profiler"].disable()
+            duration = time.perf_counter() - capture["start"]
+            self._local.capture = None
+            self.store.add(self._summarize(capture, duration, exc))
+        finally:
+            self._active.release()
+
+    # SQLAlchemy events
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        capture = getattr(self._local, "capture", None)
+        if capture is not None:
+            capture["sql"].append([statement, executemany, time.perf_counter()])
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        capture = getattr(self._local, "capture", None)
+        if capture is not None and capture["sql"]:
+            entry = capture["sql"][-1]
+            entry[2] = time.perf_counter() - entry[2]
+
+    def _summarize(self, capture: Dict, duration: float, exc) -> Dict:
+        stats = pstats.Stats(capture["profiler"])
+        functions = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True
+        )[:self.top]:
+            functions.append({
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+            })
+
+        sql = [
+            {
+                "statement": statement[:MAX_STATEMENT_LENGTH],
+                "executemany": executemany,
+                "duration_ms": round(elapsed * 1000, 3),
+            }
+            for statement, executemany, elapsed in capture["sql"]
+        ]
+        return {
+            "endpoint": request.endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": capture["status"] if exc is None else 500,
+            "started_at": capture["started_at"],
+            "duration_ms": round(duration * 1000, 3),
+            "sql_count": len(sql),
+            "sql_ms": round(sum(s["duration_ms"] for s in sql), 3),
+            "sql": sql,
+            "functions": functions,
+        }
+
+
+profiler: Optional[Profiler] = None
+
+
+def init_app(
+    app: Flask, sample_rate: float = PROFILE_SAMPLE_RATE, debug_key: str = PROFILE_DEBUG_KEY
+) -> Optional[Profiler]:
+    """Install profiling on ``app`` if ``sample_rate`` is positive.
+
+    The debug endpoint is only added when ``debug_key`` is set.
+    """
+    global profiler
+
+    if sample_rate <= 0:
+        return None
+
+    from database.db import engine
+
+    profiler = Profiler(sample_rate)
+    app.before_request(profiler.before_request)
+    app.after_request(profiler.after_request)
+    app.teardown_request(profiler.teardown_request)
+    event.listen(engine, "before_cursor_execute", profiler.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", profiler.after_cursor_execute)
+
+    if not debug_key:
+        return profiler
+
+    def debug_profiles():
+        """Recent request profiles by endpoint."""
+        if not hmac.compare_digest(request.headers.get("X-Debug-Key", ""), debug_key):
+            return {"error": "Invalid debug key"}, 401
+        return {
+            "sample_rate": profiler.sample_rate,
+            "profiles": profiler.store.get(request.args.get("endpoint")),
+        }, 200
+
+    app.add_url_rule("/api/debug/profiles", "debug_profiles", debug_profiles)
+    return profiler
@@ -1,9 +1,14 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, Response
 from flask_restful import Api, Resource
 from database import SessionLocal
+from database.books import books
 from database.order_book import OrderBook
+from database.reference import reference
 from models import Customer, Commodity, Order, OrderType, OrderStatus, Trade
+from api.passwords import RETRY_AFTER, PasswordPoolBusy, password_pool
 from api.validators import CommodityCreate, OrderCreate
+from datetime import datetime
+from pydantic import ValidationError
 import uuid
 import functools
 import logging
@@ -40,6 +45,16 @@ def authenticate(f):
     return decorated
 
 
+# Health resource
+class HealthResource(Resource):
+    def get(self):
+        """Report readiness and warm-up timings (no authentication)."""
+        from database.warmup import status
+
+        result = status()
+        return result, 200 if result["ready"] else 503
+
+
 # Login resource
 class LoginResource(Resource):
     def post(self):
@@ -55,7 +70,13 @@ class LoginResource(Resource):
         try:
             customer = db.query(Customer).filter(Customer.email == email).first()
             
-            if not customer or not customer.check_password(password):
+            # Hashing runs on the password pool, not this request thread
+            try:
+                valid = customer is not None and password_pool.check(customer.password_hash, password)
+            except PasswordPoolBusy as e:
+                return {"error": str(e)}, 503, {"Retry-After": str(RETRY_AFTER)}
+            
+            if not valid:
                 return {"error": "Invalid email or password"}, 401
                 
             return {
@@ -76,6 +97,15 @@ class CustomerResource(Resource):
         if 'password' not in data:
             return {"error": "Password required"}, 400
             
+        # Hash before taking a database session; hashing runs on the password pool
+        try:
+            password_hash = password_pool.hash(data.get('password'))
+        except PasswordPoolBusy as e:
+            return {"error": str(e)}, 503, {"Retry-After": str(RETRY_AFTER)}
+        except Exception as e:
+            logging.error("Registration error: %s", str(e))
+            return {"error": f"Registration failed: {str(e)}"}, 400
+            
         # Generate API key
         api_key = str(uuid.uuid4())
         
@@ -85,13 +115,15 @@ class CustomerResource(Resource):
             customer = Customer(
                 name=data.get('name'),
                 email=data.get('email'),
-                api_key=api_key
+                api_key=api_key,
+                password_hash=password_hash
             )
-            customer.set_password(data.get('password'))
             db.add(customer)
             db.commit()
             db.refresh(customer)
             
+            reference.add_customer(customer)
+            
             result = customer.to_dict()
             result["api_key"] = api_key  # Include API key in response
             
@@ -106,7 +138,8 @@ class CustomerResource(Resource):
     @authenticate
     def get(self):
         """Get current customer information."""
-        return g.customer.to_dict(), 200
+        payload = reference.customer(g.db, g.customer.id)
+        return Response(payload, mimetype="application/json")
 
 
 # Commodity resources
@@ -114,14 +147,16 @@ class CommodityListResource(Resource):
     @authenticate
     def get(self):
         """Get all commodities."""
-        commodities = g.db.query(Commodity).all()
-        return [c.to_dict() for c in commodities], 200
+        return Response(reference.commodity_list(g.db), mimetype="application/json")
     
     @authenticate
     def post(self):
         """Create a new commodity."""
         data = request.get_json()
-        commodity_data = CommodityCreate(**data)
+        try:
+            commodity_data = CommodityCreate(**data)
+        except ValidationError as e:
+            return {"error": str(e)}, 400
         
         # Create commodity
         commodity = Commodity(
@@ -132,6 +167,7 @@ class CommodityListResource(Resource):
         g.db.add(commodity)
         g.db.commit()
         g.db.refresh(commodity)
+        reference.invalidate_commodities()
         
         return commodity.to_dict(), 201
 
@@ -140,12 +176,12 @@ class CommodityResource(Resource):
     @authenticate
     def get(self, commodity_id):
         """Get a specific commodity."""
-        commodity = g.db.query(Commodity).filter(Commodity.id == commodity_id).first()
+        payload = reference.commodity(g.db, commodity_id)
         
-        if not commodity:
+        if payload is None:
             return {"error": f"Commodity with ID {commodity_id} not found"}, 404
             
-        return commodity.to_dict(), 200
+        return Response(payload, mimetype="application/json")
 
 
 # Order Book resources
@@ -158,6 +194,20 @@ class OrderBookResource(Resource):
         return book_snapshot, 200
 
 
+class OrderBookUpdatesResource(Resource):
+    @authenticate
+    def get(self, commodity_id):
+        """Get book events after a sequence number, or a snapshot to resync from."""
+        since = request.args.get("since", type=int)
+        level = request.args.get("level", type=int)
+        if level not in (None, 2, 3):
+            return {"error": "level must be 2 or 3"}, 400
+
+        if books.get_or_load(g.db, commodity_id) is None:
+            return {"error": f"Commodity with ID {commodity_id} not found"}, 404
+        return books.updates(commodity_id, since, level), 200
+
+
 # Order resources
 class OrderListResource(Resource):
     @authenticate
@@ -172,7 +222,10 @@ class OrderListResource(Resource):
         data = request.get_json()
         # Override customer_id with authenticated customer
         data["customer_id"] = g.customer.id
-        order_data = OrderCreate(**data)
+        try:
+            order_data = OrderCreate(**data)
+        except ValidationError as e:
+            return {"error": str(e)}, 400
         
         # Create order
         order = Order(
@@ -180,6 +233,7 @@ class OrderListResource(Resource):
             commodity_id=order_data.commodity_id,
             order_type=OrderType(order_data.order_type),
             price=order_data.price,
+            stop_price=order_data.stop_price,
             quantity=order_data.quantity,
             filled_quantity=0.0,
             status=OrderStatus.OPEN
@@ -251,12 +305,69 @@ class TradeListResource(Resource):
         return [t.to_dict() for t in trades], 200
 
 
+# Statistics resources
+class StatsResource(Resource):
+    @authenticate
+    def get(self, commodity_id):
+        """Get trade and book statistics for a commodity over the current window."""
+        from analytics.stats import book_statistics, get_trade_window
+
+        window_seconds = request.args.get("window", type=int)
+        if window_seconds is not None and window_seconds <= 0:
+            return {"error": "window must be greater than zero"}, 400
+
+        # Trade windows are kept per commodity, so only for real ones
+        if reference.commodity(g.db, commodity_id) is None:
+            return {"error": f"Commodity with ID {commodity_id} not found"}, 404
+
+        window = get_trade_window(g.db, commodity_id)
+        result = window.statistics(window_seconds)
+
+        order_book = OrderBook(g.db)
+        result["book"] = book_statistics(order_book.get_order_book_snapshot(commodity_id))
+        return result, 200
+
+
+# Export resources
+class TradeExportResource(Resource):
+    @authenticate
+    def get(self, commodity_id):
+        """Export the trade tape for a commodity as a columnar file."""
+        from analytics.export import export_bytes
+
+        fmt = request.args.get("format", "arrow")
+        try:
+            start = request.args.get("start")
+            end = request.args.get("end")
+            payload, mimetype, filename = export_bytes(
+                g.db,
+                "trades",
+                commodity_id=commodity_id,
+                start=datetime.fromisoformat(start) if start else None,
+                end=datetime.fromisoformat(end) if end else None,
+                fmt=fmt,
+            )
+        except (ValueError, RuntimeError) as e:
+            logging.error("Trade export error: %s", str(e))
+            return {"error": str(e)}, 400
+
+        return Response(
+            payload,
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+
+
 # Add resources to API
+api.add_resource(HealthResource, "/health")
 api.add_resource(LoginResource, "/login")
 api.add_resource(CustomerResource, "/customers")
 api.add_resource(CommodityListResource, "/commodities")
 api.add_resource(CommodityResource, "/commodities/<int:commodity_id>")
 api.add_resource(OrderBookResource, "/orderbook/<int:commodity_id>")
+api.add_resource(OrderBookUpdatesResource, "/orderbook/<int:commodity_id>/updates")
 api.add_resource(OrderListResource, "/orders")
 api.add_resource(OrderResource, "/orders/<int:order_id>")
 api.add_resource(TradeListResource, "/trades")
+api.add_resource(StatsResource, "/stats/<int:commodity_id>")
+api.add_resource(TradeExportResource, "/export/trades/<int:commodity_id>")
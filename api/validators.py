@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, root_validator, validator
 from typing import Optional
 from models.order import OrderType
 
@@ -18,8 +18,9 @@ class OrderCreate(BaseModel):
     customer_id: int
     commodity_id: int
     order_type: str
-    price: float
+    price: Optional[float] = None
     quantity: float
+    stop_price: Optional[float] = None
     
     @validator('order_type')
     def validate_order_type(cls, v):
@@ -29,15 +30,28 @@ class OrderCreate(BaseModel):
     
     @validator('price')
     def validate_price(cls, v):
-        if v <= 0:
+        if v is not None and v <= 0:
             raise ValueError("Price must be greater than zero")
         return v
     
+    @validator('stop_price')
+    def validate_stop_price(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("Stop price must be greater than zero")
+        return v
+    
     @validator('quantity')
     def validate_quantity(cls, v):
         if v <= 0:
             raise ValueError("Quantity must be greater than zero")
         return v
+    
+    @root_validator(skip_on_failure=True)
+    def validate_price_required(cls, values):
+        # Only a stop order may omit the limit price (stop-market)
+        if values.get('price') is None and values.get('stop_price') is None:
+            raise ValueError("Price is required unless stop_price is given")
+        return values
 
 
 class AuthHeader(BaseModel):
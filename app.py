@@ -1,7 +1,8 @@
-from flask import Flask
+from flask import Flask, request
 from flask_cors import CORS
-from database import init_db
+from database.warmup import is_ready, warm_up
 from api import api_bp
+from api import profiling
 from ui import ui_bp
 import os
 from dotenv import load_dotenv
@@ -17,12 +18,25 @@ CORS(app)
 app.register_blueprint(api_bp)
 app.register_blueprint(ui_bp)
 
-# Initialize database on startup
-@app.before_first_request
-def before_first_request():
-    init_db()
+# Servers that import the app without calling warm_up() still warm up
+# before handling their first request; the health check reports progress
+# instead of waiting for it
+@app.before_request
+def ensure_warm():
+    if not is_ready() and request.endpoint != "api.healthresource":
+        warm_up()
+
+# Sampled request profiling; a no-op unless PROFILE_SAMPLE_RATE is set
+profiling.init_app(app)
 
 if __name__ == "__main__":
+    # The debug reloader runs this module in a watcher process that never
+    # serves and again in the serving child; only the child warms up, so
+    # only its (live) books are checkpointed
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Create tables and build the in-memory books before serving
+        warm_up()
+    
     # Get port from environment or default to 5000
     port = int(os.getenv("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,8 @@
+from api.asgi import create_app
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Create ASGI app; serve with e.g. `uvicorn asgi:app`
+app = create_app()
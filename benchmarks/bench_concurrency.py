@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmark order entry throughput from 1 to N threads with per-commodity locks
+Each thread places orders through OrderBook on its own session; with --shared every
+thread trades the same commodity, otherwise thread i trades commodity i.
+
+Usage: python benchmarks/bench_concurrency.py --threads 8 --orders 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Point the app at a throwaway database before anything imports database.db
+_tmpdir = tempfile.mkdtemp(prefix="orderbook-bench-")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+
+from database.books import books
+from database.db import Base, SessionLocal, engine
+from database.order_book import OrderBook
+from models import Commodity, Customer, Order, OrderStatus, OrderType, Trade
+
+
+def reset(commodities: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    books.clear()
+    db = SessionLocal()
+    db.add_all([
+        Customer(name=f"Trader {i}", email=f"trader{i}@example.com", api_key=f"key-{i}", password_hash="-")
+        for i in range(10)
+    ])
+    db.add_all([Commodity(name=f"Commodity {i}", symbol=f"C{i}") for i in range(commodities)])
+    db.commit()
+    books.load(db)
+    db.close()
+    SessionLocal.remove()
+
+
+def worker(commodity_id: int, orders: int, seed: int, errors: list):
+    db = SessionLocal()
+    order_book = OrderBook(db)
+    rng = random.Random(seed)
+    try:
+        for _ in range(orders):
+            order_book.add_order(Order(
+                customer_id=rng.randint(1, 10),
+                commodity_id=commodity_id,
+                order_type=rng.choice((OrderType.BUY, OrderType.SELL)),
+                price=round(100.0 + rng.randint(-5, 5) / 10, 1),
+                quantity=float(rng.randint(1, 10)),
+                filled_quantity=0.0,
+                status=OrderStatus.OPEN,
+            ))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        db.close()
+        SessionLocal.remove()
+
+
+def check_consistency() -> bool:
+    """No order may be overfilled and each order's fills must match its trades."""
+    db = SessionLocal()
+    try:
+        overfilled = db.query(Order).filter(Order.filled_quantity > Order.quantity + 1e-9).count()
+        traded = {}
+        for order_id, counterparty_id, quantity in db.query(
+            Trade.order_id, Trade.counterparty_order_id, Trade.quantity
+        ):
+            traded[order_id] = traded.get(order_id, 0.0) + quantity
+            traded[counterparty_id] = traded.get(counterparty_id, 0.0) + quantity
+        mismatched = sum(
+            1 for order_id, filled in db.query(Order.id, Order.filled_quantity)
+            if abs(traded.get(order_id, 0.0) - filled) > 1e-9
+        )
+        return overfilled == 0 and mismatched == 0
+    finally:
+        db.close()
+        SessionLocal.remove()
+
+
+def run(threads: int, orders: int, shared: bool):
+    reset(1 if shared else threads)
+    errors = []
+    pool = [
+        threading.Thread(target=worker, args=(1 if shared else i + 1, orders, i, errors))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    trades = db.query(func.count(Trade.id)).scalar()
+    db.close()
+    SessionLocal.remove()
+
+    total = threads * orders
+    print(
+        f"{threads:>3} threads: {total:>6} orders, {trades:>6} trades in {elapsed:7.2f}s "
+        f"= {total / elapsed:8.1f} orders/s  consistent={check_consistency()}  errors={len(errors)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8, help="Maximum thread count")
+    parser.add_argument("--orders", type=int, default=300, help="Orders per thread")
+    parser.add_argument("--shared", action="store_true", help="All threads trade one commodity")
+    args = parser.parse_args()
+
+    print(f"Database: {os.environ['DATABASE_URL']}")
+    threads = 1
+    while threads <= args.threads:
+        run(threads, args.orders, args.shared)
+        threads *= 2
+
+
+if __name__ == "__main__":
+    main()
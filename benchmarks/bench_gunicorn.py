@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Compare gunicorn configurations under the load generator
+Each configuration is started with gunicorn.conf.py on a fresh database (a temporary
+SQLite file unless BENCH_DATABASE_URL is set), timed until /api/health reports ready,
+driven by benchmarks/loadgen.py for --duration seconds and shut down.
+
+Usage: python benchmarks/bench_gunicorn.py --clients 32 --duration 15
+       python benchmarks/bench_gunicorn.py --only gthread,async --read-only
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import loadgen  # noqa: E402
+
+# name: environment for gunicorn.conf.py
+CONFIGS = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync", "WEB_CONCURRENCY": "1"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread", "WEB_CONCURRENCY": "1", "GUNICORN_THREADS": "8"},
+    "gthread-no-preload": {
+        "GUNICORN_WORKER_CLASS": "gthread", "WEB_CONCURRENCY": "1", "GUNICORN_THREADS": "8",
+        "GUNICORN_PRELOAD": "0",
+    },
+    "async": {"GUNICORN_WORKER_CLASS": "async", "WEB_CONCURRENCY": "1"},
+    # Several processes, each with a partial view of the books; only
+    # meaningful with --read-only
+    "sync-4": {"GUNICORN_WORKER_CLASS": "sync", "WEB_CONCURRENCY": "4", "GUNICORN_ALLOW_WORKERS": "1"},
+    "gthread-4": {
+        "GUNICORN_WORKER_CLASS": "gthread", "WEB_CONCURRENCY": "4", "GUNICORN_THREADS": "8",
+        "GUNICORN_ALLOW_WORKERS": "1",
+    },
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def server(env: dict):
+    """Start serve.py with ``env`` on a fresh database and yield (url, ready seconds, log path)."""
+    tmpdir = tempfile.mkdtemp(prefix="orderbook-gunicorn-")
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    server_env = dict(
+        os.environ,
+        DATABASE_URL=os.getenv("BENCH_DATABASE_URL", f"sqlite:///{tmpdir}/bench.db"),
+        BIND=f"127.0.0.1:{port}",
+        GUNICORN_LOGLEVEL="warning",
+        **env,
+    )
+    server_env.pop("CHECKPOINT_PATH", None)
+    log = os.path.join(tmpdir, "server.log")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py")],
+        cwd=ROOT,
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=open(log, "w"),
+    )
+    try:
+        loadgen.wait_ready(url)
+        yield url, time.perf_counter() - start, log
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def bench(name: str, env: dict, clients: int, duration: float, read_only: bool) -> dict:
+    with server(env) as (url, ready, log):
+        mix = dict(loadgen.DEFAULT_MIX)
+        if read_only:
+            del mix["order"]
+        report = loadgen.run(url, clients, duration, mix=mix)
+    report["ready_s"] = round(ready, 2)
+    report["log"] = log
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gunicorn configurations.")
+    parser.add_argument("--only", default=None, help=f"Comma separated subset of: {', '.join(CONFIGS)}")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--read-only", action="store_true", help="Leave out order entry")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else [n for n in CONFIGS if not n.endswith("-4")]
+    unknown = [n for n in names if n not in CONFIGS]
+    if unknown:
+        parser.error(f"Unknown configuration(s): {', '.join(unknown)}")
+
+    rows = []
+    for name in names:
+        print(f"--- {name}", flush=True)
+        report = bench(name, CONFIGS[name], args.clients, args.duration, args.read_only)
+        loadgen.print_report(report)
+        rows.append((name, report))
+
+    print()
+    print(f"{'config':<20} {'ready s':>8} {'req/s':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, report in rows:
+        total = report["total"]
+        print(
+            f"{name:<20} {report['ready_s']:>8.2f} {total['rps']:>9.1f} {total['errors']:>7} "
+            f"{total['p50_ms']:>8.2f} {total['p99_ms']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Measure order entry while a login storm is hashing passwords
+Each mode starts one gunicorn gthread worker (see bench_gunicorn.py), runs the trading mix
+of benchmarks/loadgen.py alone, then again alongside --login-clients threads posting
+/api/login as fast as they can. Trading latency under the storm is compared between
+hashing inline on request threads (HASH_WORKERS=0) and on the password pool.
+
+Usage: python benchmarks/bench_hashing.py --clients 16 --login-clients 16 --duration 10
+"""
+
+import argparse
+import os
+import sys
+import threading
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import loadgen  # noqa: E402
+from bench_gunicorn import server  # noqa: E402
+
+SERVER = {"GUNICORN_WORKER_CLASS": "gthread", "WEB_CONCURRENCY": "1", "GUNICORN_THREADS": "8"}
+
+# name: environment for api/passwords.py
+MODES = {
+    "inline": {"HASH_WORKERS": "0"},
+    "pool": {"HASH_WORKERS": "1"},
+    # A queue as deep as the request threads lets waiting logins hold every thread
+    "pool-queue-16": {"HASH_WORKERS": "1", "HASH_QUEUE_LIMIT": "16"},
+}
+
+PASSWORD = "login-storm"
+
+
+def _login_mix(url: str) -> dict:
+    suffix = uuid.uuid4().hex[:8]
+    email = f"storm-{suffix}@example.com"
+    status, body = loadgen.Client(url).request("POST", "/api/customers", {
+        "name": f"Storm {suffix}", "email": email, "password": PASSWORD,
+    })
+    if status != 201:
+        raise RuntimeError(f"Customer registration failed: {status} {body[:200]!r}")
+    return {"login": (1, "POST", "/api/login", lambda rng, _: {"email": email, "password": PASSWORD})}
+
+
+def bench(env: dict, clients: int, login_clients: int, duration: float) -> dict:
+    with server(dict(SERVER, **env)) as (url, _, _):
+        api_keys, commodity_ids = loadgen.setup(url)
+        login_mix = _login_mix(url)
+        baseline = loadgen.run(url, clients, duration, api_keys, commodity_ids)
+
+        storm = {}
+        thread = threading.Thread(target=lambda: storm.update(
+            loadgen.run(url, login_clients, duration, api_keys, commodity_ids, login_mix, seed=1000)
+        ))
+        thread.start()
+        trading = loadgen.run(url, clients, duration, api_keys, commodity_ids)
+        thread.join()
+    return {"baseline": baseline, "trading": trading, "logins": storm}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure trading under a login storm.")
+    parser.add_argument("--only", default=None, help=f"Comma separated subset of: {', '.join(MODES)}")
+    parser.add_argument("--clients", type=int, default=16, help="Trading clients")
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(MODES)
+    unknown = [n for n in names if n not in MODES]
+    if unknown:
+        parser.error(f"Unknown mode(s): {', '.join(unknown)}")
+
+    rows = []
+    for name in names:
+        print(f"--- {name}", flush=True)
+        result = bench(MODES[name], args.clients, args.login_clients, args.duration)
+        loadgen.print_report(result["trading"])
+        rows.append((name, result))
+
+    print()
+    print(
+        f"{'mode':<14} {'base req/s':>10} {'base p99':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'order p99':>10} {'logins/s':>9} {'503s':>6}"
+    )
+    for name, result in rows:
+        base, trading, logins = result["baseline"]["total"], result["trading"]["total"], result["logins"]["total"]
+        order = result["trading"]["endpoints"]["order"]
+        print(
+            f"{name:<14} {base['rps']:>10.1f} {base['p99_ms']:>9.2f} {trading['rps']:>9.1f} "
+            f"{trading['p50_ms']:>8.2f} {trading['p99_ms']:>8.2f} {order['p99_ms']:>10.2f} "
+            f"{logins['rps']:>9.1f} {logins['rejected']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
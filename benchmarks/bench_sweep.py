@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Benchmark one incoming order sweeping through deep resting liquidity
+For each depth a fresh book of resting sell orders (a third of them partially filled)
+is taken out by a single buy. OrderBook's set-based writes (one executemany UPDATE of
+the makers, one executemany INSERT of the trades) are compared with the previous
+per-object flush, kept below as PerObjectOrderBook, by wall time and SQL statements.
+
+Usage: python benchmarks/bench_sweep.py --depths 100,1000,10000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Point the app at a throwaway database before anything imports database.db
+_tmpdir = tempfile.mkdtemp(prefix="orderbook-bench-")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func
+
+from database.books import BookRegistry
+from database.db import Base, SessionLocal, engine
+from database.matching import Resting, SelfTradePrevention, sweep
+from database.order_book import OrderBook
+from models import Commodity, Customer, Order, OrderStatus, OrderType, Trade
+
+
+class PerObjectOrderBook(OrderBook):
+    """The previous persistence: ORM makers, one flush per dirty object, refreshes."""
+
+    def add_order(self, order):
+        with self.books.lock(order.commodity_id):
+            self.db.add(order)
+            self.db.commit()
+            self.db.refresh(order)
+            trades = self.match_order(order)
+            if order.status != OrderStatus.CANCELLED:
+                order.status = self._status(order.quantity, order.filled_quantity)
+            self.db.commit()
+            self.db.refresh(order)
+        return order, trades
+
+    def match_order(self, order):
+        opposite_type = OrderType.SELL if order.order_type == OrderType.BUY else OrderType.BUY
+        matching_orders = (
+            self.db.query(Order)
+            .filter(
+                Order.commodity_id == order.commodity_id,
+                Order.order_type == opposite_type,
+                Order.status.in_([OrderStatus.OPEN, OrderStatus.PARTIAL]),
+                Order.price <= order.price,
+            )
+            .order_by(Order.price, Order.created_at, Order.id)
+            .populate_existing()
+            .with_for_update()
+            .all()
+        )
+        makers = {o.id: o for o in matching_orders}
+        result = sweep(
+            order.order_type, order.price, order.quantity,
+            [Resting(o.id, o.customer_id, o.price, o.quantity, o.filled_quantity) for o in matching_orders],
+            order.customer_id, self.stp,
+        )
+        trades = []
+        for fill in result.fills:
+            matching_order = makers[fill.maker_id]
+            trade = Trade(
+                order_id=order.id, counterparty_order_id=matching_order.id,
+                price=fill.price, quantity=fill.quantity,
+            )
+            order.filled_quantity += fill.quantity
+            matching_order.filled_quantity += fill.quantity
+            matching_order.status = self._status(matching_order.quantity, matching_order.filled_quantity)
+            self.db.add(trade)
+            trades.append(trade)
+        self.db.commit()
+        return trades
+
+
+IMPLEMENTATIONS = {"set-based": OrderBook, "per-object": PerObjectOrderBook}
+
+
+def reset(depth: int) -> float:
+    """Recreate the database with ``depth`` resting sells; returns the quantity on offer."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add_all([
+        Customer(name=f"Trader {i}", email=f"trader{i}@example.com", api_key=f"key-{i}", password_hash="-")
+        for i in range(10)
+    ])
+    db.add(Commodity(name="Commodity", symbol="C"))
+    db.commit()
+    rows = [
+        {
+            "customer_id": 2 + i % 9,
+            "commodity_id": 1,
+            "order_type": OrderType.SELL,
+            "price": round(100.0 + (i // 10) * 0.01, 2),
+            "quantity": 10.0,
+            "filled_quantity": 4.0 if i % 3 == 0 else 0.0,
+            "status": OrderStatus.PARTIAL if i % 3 == 0 else OrderStatus.OPEN,
+        }
+        for i in range(depth)
+    ]
+    db.execute(Order.__table__.insert(), rows)
+    db.commit()
+    offered = sum(r["quantity"] - r["filled_quantity"] for r in rows)
+    db.close()
+    SessionLocal.remove()
+    return offered
+
+
+def run(name: str, depth: int) -> dict:
+    offered = reset(depth)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    registry = BookRegistry()
+    registry.load(db)
+    order_book = IMPLEMENTATIONS[name](db, SelfTradePrevention.NONE, registry)
+    order = Order(
+        customer_id=1, commodity_id=1, order_type=OrderType.BUY, price=1000.0,
+        quantity=offered, filled_quantity=0.0, status=OrderStatus.OPEN,
+    )
+    event.listen(engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    try:
+        order, trades = order_book.add_order(order)
+        response = {"order": order.to_dict(), "trades": [t.to_dict() for t in trades]}
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(engine, "before_cursor_execute", count)
+
+    filled = db.query(func.count(Order.id)).filter(Order.status == OrderStatus.FILLED).scalar()
+    db.close()
+    SessionLocal.remove()
+    assert len(response["trades"]) == depth and filled == depth + 1, (len(response["trades"]), filled)
+    return {"elapsed": elapsed, "statements": len(statements)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depths", default="100,1000,10000", help="Comma separated resting order counts")
+    args = parser.parse_args()
+
+    print(f"Database: {os.environ['DATABASE_URL']}")
+    print(f"{'depth':>7} {'implementation':<12} {'sweep ms':>10} {'statements':>11} {'trades/s':>10}")
+    for depth in (int(d) for d in args.depths.split(",")):
+        for name in IMPLEMENTATIONS:
+            result = run(name, depth)
+            print(
+                f"{depth:>7} {name:<12} {result['elapsed'] * 1000:>10.1f} {result['statements']:>11} "
+                f"{depth / result['elapsed']:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""
+HTTP load generator for a running server (development, gunicorn or ASGI)
+Each client thread keeps one keep-alive connection and issues a weighted mix of
+reference data reads, book reads and order entry for --duration seconds, then
+latency percentiles and throughput are reported per endpoint.
+
+Usage: python benchmarks/loadgen.py --url http://127.0.0.1:5000 --clients 32 --duration 20
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+def order_body(rng: random.Random, commodity_id: int) -> Dict:
+    return {
+        "commodity_id": commodity_id,
+        "order_type": rng.choice(("buy", "sell")),
+        "price": round(100.0 + rng.randint(-5, 5) / 10, 1),
+        "quantity": float(rng.randint(1, 10)),
+    }
+
+
+# name: (weight, method, path template[, body builder])
+DEFAULT_MIX = {
+    "commodities": (3, "GET", "/api/commodities"),
+    "commodity": (2, "GET", "/api/commodities/{commodity_id}"),
+    "orderbook": (2, "GET", "/api/orderbook/{commodity_id}"),
+    "updates": (2, "GET", "/api/orderbook/{commodity_id}/updates"),
+    "order": (1, "POST", "/api/orders", order_body),
+}
+
+# Responses that mean "shed by the server", counted apart from errors
+REJECTED_STATUSES = (429, 503)
+
+
+class Client:
+    """One keep-alive connection that reconnects after errors."""
+
+    def __init__(self, url: str, api_key: Optional[str] = None, timeout: float = 30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.api_key = api_key
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, bytes]:
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def wait_ready(url: str, timeout: float = 60) -> float:
+    """Poll /api/health until it returns 200; returns the seconds waited."""
+    start = time.perf_counter()
+    client = Client(url, timeout=5)
+    while True:
+        try:
+            status, _ = client.request("GET", "/api/health")
+            if status == 200:
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f"{url} not ready after {timeout}s")
+        time.sleep(0.1)
+
+
+def setup(url: str, commodities: int = 3, customers: int = 4) -> Tuple[List[str], List[int]]:
+    """Register load-test customers and make sure some commodities exist.
+
+    Several customers are needed for orders to trade: self-trade prevention
+    stops a customer's orders from matching each other.
+    """
+    client = Client(url)
+    suffix = uuid.uuid4().hex[:8]
+    api_keys = []
+    for i in range(customers):
+        status, body = client.request("POST", "/api/customers", {
+            "name": f"Load {suffix} {i}",
+            "email": f"load-{suffix}-{i}@example.com",
+            "password": "load-test",
+        })
+        if status != 201:
+            raise RuntimeError(f"Customer registration failed: {status} {body[:200]!r}")
+        api_keys.append(json.loads(body)["api_key"])
+    client.api_key = api_keys[0]
+
+    status, body = client.request("GET", "/api/commodities")
+    commodity_ids = [c["id"] for c in json.loads(body)]
+    for i in range(len(commodity_ids), commodities):
+        status, body = client.request("POST", "/api/commodities", {
+            "name": f"Load commodity {suffix} {i}",
+            "symbol": f"L{suffix[:4]}{i}"[:10],
+        })
+        commodity_ids.append(json.loads(body)["id"])
+    return api_keys, commodity_ids[:commodities]
+
+
+def _client_loop(url, api_key, commodity_ids, mix, deadline, seed, results, lock):
+    rng = random.Random(seed)
+    client = Client(url, api_key)
+    names = list(mix)
+    weights = [mix[name][0] for name in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    rejected = defaultdict(int)
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        _, method, template, *body_builder = mix[name]
+        commodity_id = rng.choice(commodity_ids)
+        body = body_builder[0](rng, commodity_id) if body_builder else None
+        start = time.perf_counter()
+        try:
+            status, _ = client.request(method, template.format(commodity_id=commodity_id), body)
+        except OSError:
+            status = None
+        elapsed = time.perf_counter() - start
+        if status in REJECTED_STATUSES:
+            rejected[name] += 1
+        elif status is None or status >= 400:
+            errors[name] += 1
+        else:
+            latencies[name].append(elapsed)
+
+    with lock:
+        for name, values in latencies.items():
+            results["latencies"][name].extend(values)
+        for name, count in errors.items():
+            results["errors"][name] += count
+        for name, count in rejected.items():
+            results["rejected"][name] += count
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(
+    url: str,
+    clients: int = 16,
+    duration: float = 10,
+    api_keys: Optional[List[str]] = None,
+    commodity_ids: Optional[List[int]] = None,
+    mix: Optional[Dict] = None,
+    seed: int = 0,
+) -> Dict:
+    """Run the load and return per-endpoint and total statistics.
+
+    Clients take turns over ``api_keys``; customers and commodities are
+    created first when either is missing.
+    """
+    mix = mix or DEFAULT_MIX
+    if not api_keys or not commodity_ids:
+        api_keys, commodity_ids = setup(url)
+
+    results = {"latencies": defaultdict(list), "errors": defaultdict(int), "rejected": defaultdict(int)}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=_client_loop,
+            args=(url, api_keys[i % len(api_keys)], commodity_ids, mix, deadline, seed + i, results, lock),
+            daemon=True,
+        )
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    def summary(values, errors, rejected):
+        return {
+            "requests": len(values),
+            "errors": errors,
+            "rejected": rejected,
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 2),
+        }
+
+    endpoints = {
+        name: summary(results["latencies"][name], results["errors"][name], results["rejected"][name])
+        for name in mix
+    }
+    all_latencies = [v for values in results["latencies"].values() for v in values]
+    return {
+        "clients": clients,
+        "duration": round(elapsed, 2),
+        "total": summary(
+            all_latencies, sum(results["errors"].values()), sum(results["rejected"].values())
+        ),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report: Dict):
+    print(f"{report['clients']} clients for {report['duration']}s")
+    print(
+        f"{'endpoint':<12} {'requests':>9} {'errors':>7} {'rejected':>9} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, s in rows:
+        print(
+            f"{name:<12} {s['requests']:>9} {s['errors']:>7} {s['rejected']:>9} {s['rps']:>9.1f} "
+            f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate HTTP load against the order book API.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run")
+    parser.add_argument(
+        "--api-key", action="append", default=None,
+        help="Use an existing customer instead of registering some (repeatable)",
+    )
+    parser.add_argument("--read-only", action="store_true", help="Leave out order entry")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    mix = dict(DEFAULT_MIX)
+    if args.read_only:
+        del mix["order"]
+
+    wait_ready(args.url)
+    commodity_ids = None
+    if args.api_key:
+        status, body = Client(args.url, args.api_key[0]).request("GET", "/api/commodities")
+        commodity_ids = [c["id"] for c in json.loads(body)]
+    report = run(args.url, args.clients, args.duration, args.api_key, commodity_ids, mix)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
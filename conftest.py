@@ -0,0 +1,116 @@
+"""Shared test fixtures: a fresh database per test and order entry helpers."""
+
+import os
+import tempfile
+
+# Point the app at a throwaway database before anything imports database.db
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='orderbook-test-')}/test.db"
+# Hash passwords inline: app tests start no worker processes
+os.environ["HASH_WORKERS"] = "0"
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.books import BookRegistry
+from database.db import Base
+from database.matching import SelfTradePrevention
+from database.order_book import OrderBook
+from models import Commodity, Customer, Order, OrderStatus
+
+
+def create_database(url="sqlite://"):
+    """Engine with every table created; an in-memory database keeps one shared connection."""
+    if url == "sqlite://":
+        engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def engine():
+    engine = create_database()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """Session on an in-memory database holding commodities 1 (Gold) and 2 (Silver)."""
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.add_all([Commodity(name="Gold", symbol="AU"), Commodity(name="Silver", symbol="AG")])
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of an SQLite file with every table created, for tests that need several engines."""
+    path = tmp_path / "test.db"
+    create_database(f"sqlite:///{path}").dispose()
+    return path
+
+
+def reset_app_db():
+    """Empty the application's (throwaway) database and reset its in-process state.
+
+    The commodities are seeded as for ``db``. Returns the app's scoped ``SessionLocal``.
+    """
+    from analytics import stats
+    from database.books import books
+    from database.db import SessionLocal, engine as app_engine
+    from database.reference import reference
+
+    SessionLocal.remove()
+    Base.metadata.drop_all(bind=app_engine)
+    Base.metadata.create_all(bind=app_engine)
+    books.clear()
+    reference.clear()
+    stats._windows.clear()
+    session = SessionLocal()
+    session.add_all([Commodity(name="Gold", symbol="AU"), Commodity(name="Silver", symbol="AG")])
+    session.commit()
+    SessionLocal.remove()
+    return SessionLocal
+
+
+@pytest.fixture
+def app_db():
+    SessionLocal = reset_app_db()
+    yield SessionLocal
+    SessionLocal.remove()
+
+
+def add_customer(db, name="Alice"):
+    """Add a customer directly (no password hashing); returns its API key."""
+    customer = Customer(
+        name=name, email=f"{name.lower()}@example.com", password_hash="-", api_key=f"{name.lower()}-key",
+    )
+    db.add(customer)
+    db.commit()
+    return customer.api_key
+
+
+@pytest.fixture
+def order_book(db):
+    registry = BookRegistry()
+    registry.load(db)
+    return OrderBook(db, SelfTradePrevention.NONE, registry)
+
+
+def submit(order_book, customer_id, order_type, quantity, price=None, stop_price=None, commodity_id=1):
+    """Enter an order through ``order_book``; returns ``(order, trades)``."""
+    return order_book.add_order(Order(
+        customer_id=customer_id,
+        commodity_id=commodity_id,
+        order_type=order_type,
+        price=price,
+        stop_price=stop_price,
+        quantity=quantity,
+        filled_quantity=0.0,
+        status=OrderStatus.OPEN,
+    ))
@@ -0,0 +1,51 @@
+"""Async engine and sessions for the ASGI serving mode.
+
+The async URL is derived from ``DATABASE_URL`` by switching to an asyncio
+driver (``aiosqlite`` for SQLite, ``asyncpg`` for PostgreSQL) unless
+``ASYNC_DATABASE_URL`` is set explicitly. Connections are pooled: many idle
+clients share ``DB_POOL_SIZE`` connections instead of holding one each.
+"""
+
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from database.db import DATABASE_URL
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+
+
+def async_url(url: str) -> str:
+    """Return ``url`` with its driver replaced by an asyncio one."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+    return str(parsed.set(drivername=ASYNC_DRIVERS[backend]))
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+# Create async engine
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+)
+
+# Create async session factory; objects stay usable after commit so handlers
+# can serialize them without another round trip
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
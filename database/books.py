@@ -0,0 +1,274 @@
+"""Process-wide in-memory order books, one per commodity.
+
+The books mirror the open orders in the database. They are built at warm-up
+from a plain column query (no ORM objects are hydrated) and kept current by
+``OrderBook`` after each commit. The database stays the source of truth;
+a book that has not been loaded yet is simply absent from the registry.
+
+``lock(commodity_id)`` is the per-commodity matching lock: ``OrderBook``
+holds it from inserting an order until its fills are committed and mirrored,
+so matching within a book is serialized while different books can match
+concurrently (on a server database; SQLite serializes every write
+transaction). Readers of a book's structure take the same lock.
+
+Each registered book reports its changes to the commodity's market data
+``EventRing``. Rings outlive the books: rebuilding a book resets its ring so
+clients resynchronise from a snapshot.
+
+Pending stop orders are kept apart from the resting orders, in one
+``TriggerBook`` per commodity seeded with the commodity's last trade price.
+They are guarded by the same per-commodity lock.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.market_data import EventRing
+from database.matching import PriceLevelBook, TriggerBook
+from models import Commodity, Order, OrderStatus, Trade
+
+OPEN_STATUSES = [OrderStatus.OPEN, OrderStatus.PARTIAL]
+
+
+class BookRegistry:
+    """Registry of in-memory ``PriceLevelBook`` instances keyed by commodity id."""
+
+    def __init__(self):
+        self._books: Dict[int, PriceLevelBook] = {}
+        self._rings: Dict[int, EventRing] = {}
+        self._triggers: Dict[int, TriggerBook] = {}
+        self._locks: Dict[int, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._books)
+
+    def get(self, commodity_id: int) -> Optional[PriceLevelBook]:
+        return self._books.get(commodity_id)
+
+    def lock(self, commodity_id: int) -> threading.RLock:
+        """Return the matching lock for a commodity, creating it on first use."""
+        lock = self._locks.get(commodity_id)
+        if lock is None:
+            with self._lock:
+                lock = self._locks.setdefault(commodity_id, threading.RLock())
+        return lock
+
+    def ring(self, commodity_id: int) -> EventRing:
+        """Return the market data ring for a commodity, creating it on first use."""
+        ring = self._rings.get(commodity_id)
+        if ring is None:
+            with self._lock:
+                ring = self._rings.setdefault(commodity_id, EventRing(commodity_id))
+        return ring
+
+    def _attach(self, books: Dict[int, PriceLevelBook]):
+        for commodity_id, book in books.items():
+            ring = self.ring(commodity_id)
+            ring.reset()
+            book.listener = ring
+
+    def items(self) -> List[Tuple[int, PriceLevelBook]]:
+        return list(self._books.items())
+
+    def get_or_load(self, db: Session, commodity_id: int) -> Optional[PriceLevelBook]:
+        """Return the book for a commodity, loading it from the database on first use.
+
+        Returns None for a commodity that does not exist, without creating a
+        book for it. The load runs under the commodity's matching lock so an
+        order committed while it reads cannot be missing from the book.
+        """
+        book = self._books.get(commodity_id)
+        if book is None:
+            with self.lock(commodity_id):
+                book = self._books.get(commodity_id)
+                if book is None:
+                    if db.query(Commodity.id).filter(Commodity.id == commodity_id).first() is None:
+                        return None
+                    self.load(db, commodity_id)
+                    book = self._books[commodity_id]
+        return book
+
+    def load(self, db: Session, commodity_id: Optional[int] = None) -> int:
+        """(Re)build books from the open orders in the database.
+
+        Loads every commodity when ``commodity_id`` is None. Returns the
+        number of resting orders loaded.
+        """
+        query = db.query(
+            Order.id,
+            Order.customer_id,
+            Order.commodity_id,
+            Order.order_type,
+            Order.price,
+            Order.quantity,
+            Order.filled_quantity,
+        ).filter(Order.status.in_(OPEN_STATUSES))
+
+        if commodity_id is None:
+            commodity_ids = [row[0] for row in db.query(Commodity.id)]
+        else:
+            commodity_ids = [commodity_id]
+            query = query.filter(Order.commodity_id == commodity_id)
+
+        books = {cid: PriceLevelBook(cid) for cid in commodity_ids}
+        count = 0
+        for order_id, customer_id, cid, order_type, price, quantity, filled in (
+            query.order_by(Order.created_at, Order.id)
+        ):
+            book = books.get(cid)
+            if book is None:
+                book = books[cid] = PriceLevelBook(cid)
+            book.rest(order_id, customer_id, order_type, price, quantity, filled)
+            count += 1
+
+        self._attach(books)
+        with self._lock:
+            if commodity_id is None:
+                self._books = books
+            else:
+                self._books.update(books)
+        return count
+
+    def triggers(self, db: Session, commodity_id: int) -> TriggerBook:
+        """Return the stop-order trigger book for a commodity, loading it on first use."""
+        trigger_book = self._triggers.get(commodity_id)
+        if trigger_book is None:
+            self.load_triggers(db, commodity_id)
+            trigger_book = self._triggers[commodity_id]
+        return trigger_book
+
+    def load_triggers(self, db: Session, commodity_id: Optional[int] = None) -> int:
+        """(Re)build trigger books from the pending stop orders in the database.
+
+        Loads every commodity when ``commodity_id`` is None. Returns the
+        number of pending stop orders loaded.
+        """
+        query = db.query(
+            Order.id,
+            Order.commodity_id,
+            Order.order_type,
+            Order.stop_price,
+        ).filter(Order.status == OrderStatus.PENDING)
+        # Trade ids increase with execution, so the highest id is the last trade
+        last_trades = (
+            db.query(func.max(Trade.id))
+            .join(Order, Order.id == Trade.order_id)
+            .group_by(Order.commodity_id)
+        )
+
+        if commodity_id is None:
+            commodity_ids = [row[0] for row in db.query(Commodity.id)]
+        else:
+            commodity_ids = [commodity_id]
+            query = query.filter(Order.commodity_id == commodity_id)
+            last_trades = last_trades.filter(Order.commodity_id == commodity_id)
+
+        last_prices = dict(
+            db.query(Order.commodity_id, Trade.price)
+            .join(Order, Order.id == Trade.order_id)
+            .filter(Trade.id.in_(last_trades.scalar_subquery()))
+        )
+        trigger_books = {cid: TriggerBook(cid, last_prices.get(cid)) for cid in commodity_ids}
+        count = 0
+        for order_id, cid, order_type, stop_price in query.order_by(Order.id):
+            trigger_book = trigger_books.get(cid)
+            if trigger_book is None:
+                trigger_book = trigger_books[cid] = TriggerBook(cid, last_prices.get(cid))
+            trigger_book.add(order_id, order_type, stop_price)
+            count += 1
+
+        with self._lock:
+            if commodity_id is None:
+                self._triggers = trigger_books
+            else:
+                self._triggers.update(trigger_books)
+        return count
+
+    def updates(self, commodity_id: int, since: Optional[int] = None, level: Optional[int] = None) -> Dict:
+        """Market data events after ``since`` for a loaded book, or a snapshot to resync from."""
+        ring = self.ring(commodity_id)
+
+        events = ring.since(since) if since is not None else None
+        if events is not None:
+            return {
+                "commodity_id": commodity_id,
+                "type": "updates",
+                "seq": events[-1]["seq"] if events else since,
+                "events": [e for e in events if level is None or e["level"] == level],
+            }
+
+        # Under the lock the snapshot and its sequence number agree exactly
+        with self.lock(commodity_id):
+            book = self._books[commodity_id]
+            seq = ring.seq
+            snapshot = book.snapshot()
+            entries = book.entries()
+        snapshot.update({
+            "type": "snapshot",
+            "seq": seq,
+            "orders": [
+                {
+                    "order_id": order_id,
+                    "side": order_type.value,
+                    "price": price,
+                    "quantity": quantity - filled_quantity,
+                }
+                for order_id, _, order_type, price, quantity, filled_quantity in entries
+            ],
+        })
+        return snapshot
+
+    def replace(self, books: Dict[int, PriceLevelBook]):
+        """Swap in a complete set of books, e.g. restored from a checkpoint."""
+        self._attach(books)
+        with self._lock:
+            self._books = dict(books)
+
+    def record_order(self, order: Order, makers: Iterable[Tuple] = ()):
+        """Mirror a committed order and the resting orders it touched.
+
+        ``makers`` holds the final (id, quantity, filled_quantity, status) of
+        each resting order that was filled or hit by self-trade prevention.
+        """
+        book = self._books.get(order.commodity_id)
+        if book is None:
+            return
+        for order_id, quantity, filled_quantity, status in makers:
+            if order_id not in book:
+                continue
+            if status in OPEN_STATUSES:
+                book.amend(order_id, quantity, filled_quantity)
+            else:
+                book.cancel(order_id)
+        if order.status in OPEN_STATUSES and order.id not in book:
+            book.rest(
+                order.id,
+                order.customer_id,
+                order.order_type,
+                order.price,
+                order.quantity,
+                order.filled_quantity,
+                # A triggered stop keeps its submission priority
+                by_id=order.stop_price is not None,
+            )
+
+    def record_cancel(self, order: Order):
+        """Mirror a committed cancel of a resting or pending stop order."""
+        book = self._books.get(order.commodity_id)
+        if book is not None:
+            book.cancel(order.id)
+        trigger_book = self._triggers.get(order.commodity_id)
+        if trigger_book is not None:
+            trigger_book.cancel(order.id)
+
+    def clear(self):
+        with self._lock:
+            self._books = {}
+            self._triggers = {}
+
+
+books = BookRegistry()
@@ -0,0 +1,246 @@
+"""Order book checkpoints in a compact fixed-layout binary file.
+
+A checkpoint holds every resting order of every in-memory book, so a restart
+can memory-map the file instead of rebuilding the books from the ``orders``
+table. Recovery is load-checkpoint plus a short tail: orders whose
+``updated_at`` is at or after the checkpoint watermark are re-read from the
+database and applied on top. Applying the tail is idempotent, which is what
+lets the checkpoint be written while matching carries on.
+
+File layout (little-endian)::
+
+    header   56 bytes   magic, version, commodity count, created_at,
+                        watermark, last order id, last trade id, record count
+    index    24 bytes   per commodity: commodity id, first record, record count
+    records  48 bytes   per resting order: order id, customer id, side,
+                        price, quantity, filled quantity
+
+Timestamps are microseconds since the Unix epoch (naive UTC, like the
+database columns). Records of one commodity are stored bids then asks, in
+queue order within each price level, so restoring them in file order
+rebuilds the same time priority.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.books import OPEN_STATUSES, BookRegistry
+from database.db import SessionLocal
+from database.matching import PriceLevelBook
+from models import Commodity, Order, OrderType, Trade
+
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "")
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", 60))
+
+MAGIC = b"OBOOKCKP"
+VERSION = 1
+
+HEADER = struct.Struct("<8sHHIqqqqQ")
+INDEX = struct.Struct("<qQQ")
+RECORD = struct.Struct("<qqB7xddd")
+
+SIDES = [OrderType.BUY, OrderType.SELL]
+SIDE_CODES = {order_type: code for code, order_type in enumerate(SIDES)}
+
+EPOCH = datetime(1970, 1, 1)
+NO_WATERMARK = -1
+
+CheckpointHeader = namedtuple(
+    "CheckpointHeader",
+    ["created_at", "watermark", "last_order_id", "last_trade_id", "commodities", "records"],
+)
+
+
+class CheckpointError(Exception):
+    """Raised when a checkpoint file is missing, truncated or of another format."""
+
+
+def _to_micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return NO_WATERMARK
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> Optional[datetime]:
+    if value == NO_WATERMARK:
+        return None
+    return EPOCH + timedelta(microseconds=value)
+
+
+def write_checkpoint(db: Session, registry: BookRegistry, path: str) -> CheckpointHeader:
+    """Write all books in ``registry`` to ``path`` atomically."""
+    # Read the watermark before copying the books: anything that changes
+    # while they are copied is newer than the watermark and replayed on recovery
+    watermark = db.query(func.max(Order.updated_at)).scalar()
+    last_order_id = db.query(func.max(Order.id)).scalar() or 0
+    last_trade_id = db.query(func.max(Trade.id)).scalar() or 0
+
+    # Each book is copied under its matching lock, so every change committed
+    # before the watermark was read is already mirrored in the copy
+    books = []
+    for commodity_id, book in registry.items():
+        with registry.lock(commodity_id):
+            books.append((commodity_id, book.entries()))
+    record_count = sum(len(entries) for _, entries in books)
+    created_at = datetime.utcnow()
+
+    buffer = bytearray(HEADER.size + INDEX.size * len(books) + RECORD.size * record_count)
+    HEADER.pack_into(
+        buffer, 0, MAGIC, VERSION, 0, len(books), _to_micros(created_at),
+        _to_micros(watermark), last_order_id, last_trade_id, record_count,
+    )
+
+    index_offset = HEADER.size
+    record_offset = HEADER.size + INDEX.size * len(books)
+    first = 0
+    for commodity_id, entries in books:
+        INDEX.pack_into(buffer, index_offset, commodity_id, first, len(entries))
+        index_offset += INDEX.size
+        for order_id, customer_id, order_type, price, quantity, filled_quantity in entries:
+            RECORD.pack_into(
+                buffer, record_offset, order_id, customer_id, SIDE_CODES[order_type],
+                price, quantity, filled_quantity,
+            )
+            record_offset += RECORD.size
+        first += len(entries)
+
+    # Per process, so concurrent writers never share a temporary file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return CheckpointHeader(created_at, watermark, last_order_id, last_trade_id, len(books), record_count)
+
+
+def read_checkpoint(path: str) -> Tuple[CheckpointHeader, Dict[int, PriceLevelBook]]:
+    """Memory-map a checkpoint file and rebuild its books."""
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        raise CheckpointError(f"Cannot open checkpoint {path}: {e}")
+
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise CheckpointError(f"Checkpoint {path} is truncated")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            (
+                magic, version, _, commodity_count, created_at, watermark,
+                last_order_id, last_trade_id, record_count,
+            ) = HEADER.unpack_from(mm, 0)
+
+            if magic != MAGIC or version != VERSION:
+                raise CheckpointError(f"{path} is not a version {VERSION} order book checkpoint")
+            records_start = HEADER.size + INDEX.size * commodity_count
+            if size != records_start + RECORD.size * record_count:
+                raise CheckpointError(f"Checkpoint {path} is truncated")
+
+            books = {}
+            with memoryview(mm) as view:
+                for i in range(commodity_count):
+                    commodity_id, first, count = INDEX.unpack_from(view, HEADER.size + INDEX.size * i)
+                    book = books[commodity_id] = PriceLevelBook(commodity_id)
+                    start = records_start + RECORD.size * first
+                    with view[start:start + RECORD.size * count] as records:
+                        for order_id, customer_id, side, price, quantity, filled in RECORD.iter_unpack(records):
+                            book.rest(order_id, customer_id, SIDES[side], price, quantity, filled)
+
+    header = CheckpointHeader(
+        _from_micros(created_at), _from_micros(watermark),
+        last_order_id, last_trade_id, commodity_count, record_count,
+    )
+    return header, books
+
+
+def recover(db: Session, registry: BookRegistry, path: str) -> Dict:
+    """Rebuild ``registry`` from a checkpoint plus the database tail after its watermark.
+
+    Commodities that are not in the checkpoint are loaded from the database.
+    Returns counts describing the recovery.
+    """
+    header, books = read_checkpoint(path)
+
+    tail = db.query(
+        Order.id,
+        Order.customer_id,
+        Order.commodity_id,
+        Order.order_type,
+        Order.status,
+        Order.price,
+        Order.quantity,
+        Order.filled_quantity,
+    )
+    if header.watermark is not None:
+        tail = tail.filter(Order.updated_at >= header.watermark)
+
+    tail_count = 0
+    for order_id, customer_id, commodity_id, order_type, status, price, quantity, filled in (
+        tail.order_by(Order.created_at, Order.id)
+    ):
+        book = books.get(commodity_id)
+        if book is None:
+            continue
+        tail_count += 1
+        if status not in OPEN_STATUSES:
+            book.cancel(order_id)
+        elif order_id in book:
+            book.amend(order_id, quantity, filled)
+        else:
+            book.rest(order_id, customer_id, order_type, price, quantity, filled)
+
+    registry.replace(books)
+
+    missing = [cid for (cid,) in db.query(Commodity.id) if cid not in books]
+    for commodity_id in missing:
+        registry.load(db, commodity_id)
+
+    return {
+        "checkpoint_records": header.records,
+        "checkpoint_created_at": header.created_at.isoformat(),
+        "tail_orders": tail_count,
+        "loaded_from_database": len(missing),
+    }
+
+
+class Checkpointer(threading.Thread):
+    """Background thread that checkpoints a registry every ``interval`` seconds."""
+
+    def __init__(self, registry: BookRegistry, path: str, interval: float = CHECKPOINT_INTERVAL):
+        super().__init__(name="book-checkpointer", daemon=True)
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.last = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.checkpoint()
+
+    def checkpoint(self) -> Optional[CheckpointHeader]:
+        db = SessionLocal()
+        try:
+            self.last = write_checkpoint(db, self.registry, self.path)
+            return self.last
+        except Exception as e:
+            logging.error("Checkpoint error: %s", str(e))
+            return None
+        finally:
+            db.close()
+            SessionLocal.remove()
+
+    def stop(self):
+        self._stopped.set()
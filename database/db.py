@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -33,6 +35,61 @@ def init_db():
     """Initialize database by creating all tables."""
     from models import Customer, Commodity, Order, Trade
     Base.metadata.create_all(bind=engine)
+    migrate_db()
+
+
+def migrate_db(bind=engine):
+    """Bring an existing ``orders`` table up to date with stop orders.
+
+    Adds the ``stop_price`` column and drops NOT NULL from ``price``. SQLite
+    cannot alter a column, so there the table is rebuilt and its rows copied.
+    Returns the steps applied; an up-to-date database is left untouched.
+    """
+    from models import Order
+
+    if not inspect(bind).has_table("orders"):
+        return []
+    columns = {c["name"]: c for c in inspect(bind).get_columns("orders")}
+    steps = []
+
+    with bind.connect() as conn:
+        if bind.dialect.name == "postgresql":
+            # Enum values cannot be added inside a transaction before PostgreSQL 12
+            conn.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql(
+                "ALTER TYPE orderstatus ADD VALUE IF NOT EXISTS 'PENDING'"
+            )
+
+        if bind.dialect.name == "sqlite":
+            # Rows are copied into a new table while the old one is dropped
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+
+        with conn.begin():
+            if "stop_price" not in columns:
+                conn.exec_driver_sql("ALTER TABLE orders ADD COLUMN stop_price FLOAT")
+                steps.append("add orders.stop_price")
+
+            if not columns["price"]["nullable"]:
+                if bind.dialect.name == "sqlite":
+                    table = Order.__table__
+                    create = str(CreateTable(table).compile(bind)).replace(
+                        "CREATE TABLE orders", "CREATE TABLE orders_migrating", 1
+                    )
+                    names = ", ".join(c.name for c in table.columns)
+                    conn.exec_driver_sql(create)
+                    conn.exec_driver_sql(
+                        f"INSERT INTO orders_migrating ({names}) SELECT {names} FROM orders"
+                    )
+                    conn.exec_driver_sql("DROP TABLE orders")
+                    conn.exec_driver_sql("ALTER TABLE orders_migrating RENAME TO orders")
+                    for index in table.indexes:
+                        index.create(conn)
+                else:
+                    conn.exec_driver_sql("ALTER TABLE orders ALTER COLUMN price DROP NOT NULL")
+                steps.append("make orders.price nullable")
+
+    for step in steps:
+        logging.info("Database migration: %s", step)
+    return steps
 
 
 def reset_db():
@@ -0,0 +1,106 @@
+"""Sequenced incremental market data for the in-memory books.
+
+Every change to a ``PriceLevelBook`` that has an ``EventRing`` attached is
+recorded as two events, each with its own sequence number:
+
+* a level 3 event for the order (``add``, ``reduce`` or ``delete``) carrying
+  the order's remaining quantity, and
+* a level 2 event for its price level (``add``, ``reduce`` or ``delete``)
+  carrying the level's new aggregate quantity.
+
+Events carry absolute quantities rather than differences, so applying an
+event twice is harmless. A client that takes a snapshot and then applies
+every event after the snapshot's sequence number converges on the book even
+if the snapshot already reflected some of those events.
+
+The ring keeps the last ``MARKET_DATA_BUFFER`` events per commodity. A client
+asking for events older than that gets a fresh snapshot instead.
+"""
+
+import os
+import threading
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Optional
+
+from models import OrderType
+
+MARKET_DATA_BUFFER = int(os.getenv("MARKET_DATA_BUFFER", 10000))
+
+
+class EventRing:
+    """Bounded, sequenced buffer of book events for one commodity."""
+
+    def __init__(self, commodity_id: int, capacity: int = MARKET_DATA_BUFFER):
+        self.commodity_id = commodity_id
+        self._events = deque(maxlen=capacity)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the most recent event."""
+        return self._seq
+
+    def book_changed(
+        self,
+        action: str,
+        order_type: OrderType,
+        price: float,
+        order_id: int,
+        remaining: float,
+        level_before: float,
+        level_after: Optional[float],
+    ):
+        """Record an order change and the resulting change to its price level."""
+        if level_after is None:
+            level_action = "delete"
+        elif level_after > level_before:
+            level_action = "add"
+        else:
+            level_action = "reduce"
+
+        side = order_type.value
+        with self._lock:
+            self._seq += 1
+            self._events.append({
+                "seq": self._seq,
+                "level": 3,
+                "action": action,
+                "side": side,
+                "price": price,
+                "order_id": order_id,
+                "quantity": remaining,
+            })
+            self._seq += 1
+            self._events.append({
+                "seq": self._seq,
+                "level": 2,
+                "action": level_action,
+                "side": side,
+                "price": price,
+                "quantity": level_after or 0.0,
+            })
+
+    def since(self, seq: int) -> Optional[List[Dict]]:
+        """Events after ``seq``, or None if some of them have aged out of the buffer."""
+        with self._lock:
+            if seq > self._seq:
+                return None
+            if seq == self._seq:
+                return []
+            if not self._events or self._events[0]["seq"] > seq + 1:
+                return None
+            # Sequence numbers are contiguous, so the offset is direct
+            start = seq + 1 - self._events[0]["seq"]
+            return list(islice(self._events, start, None))
+
+    def reset(self):
+        """Drop buffered events, e.g. after the book was rebuilt.
+
+        The sequence number is bumped as well, so every client, including one
+        that was fully up to date, falls back to a snapshot.
+        """
+        with self._lock:
+            self._events.clear()
+            self._seq += 1
@@ -0,0 +1,428 @@
+"""Pure price-time priority matching, independent of persistence.
+
+``sweep`` decides which resting orders an incoming order trades against and
+is shared by the database-backed ``OrderBook`` and the in-memory
+``PriceLevelBook``, so both produce the same trades for the same order flow.
+
+Self-trade prevention is applied inside the sweep, when the incoming order
+meets a resting order of the same customer:
+
+* ``cancel_newest``  - the rest of the incoming order is cancelled
+* ``cancel_oldest``  - the resting order is cancelled and matching continues
+* ``decrement_both`` - both orders are reduced by the smaller remaining
+                       quantity without a trade, and matching continues;
+                       an order reduced to nothing is cancelled, or filled
+                       if it had traded before
+* ``none``           - the orders trade as usual
+
+The default comes from the ``SELF_TRADE_PREVENTION`` environment variable.
+
+Stop orders wait in a ``TriggerBook`` until the last trade price reaches
+their stop price, and are then matched like any other incoming order.
+"""
+
+import os
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
+from heapq import heapify, heappop, heappush
+from enum import Enum
+from typing import Dict, Iterable, List, Optional
+
+from models import OrderType
+
+
+class SelfTradePrevention(Enum):
+    NONE = "none"
+    CANCEL_NEWEST = "cancel_newest"
+    CANCEL_OLDEST = "cancel_oldest"
+    DECREMENT_BOTH = "decrement_both"
+
+
+DEFAULT_STP = SelfTradePrevention(os.getenv("SELF_TRADE_PREVENTION", "cancel_newest"))
+
+# A single execution of the incoming order against one resting (maker) order
+Fill = namedtuple("Fill", ["maker_id", "price", "quantity"])
+
+# A self-trade that was prevented: the resting order is cancelled outright
+# (cancel_maker) or reduced by ``quantity`` (decrement_both)
+Prevention = namedtuple("Prevention", ["maker_id", "quantity", "cancel_maker"])
+
+# Outcome of a sweep. ``decremented`` is the quantity removed from the
+# incoming order by decrement_both; ``cancelled`` is set when cancel_newest
+# stopped it.
+Sweep = namedtuple("Sweep", ["fills", "preventions", "decremented", "cancelled"])
+
+# Resting order as seen by ``sweep``: remaining quantity is quantity - filled
+Resting = namedtuple("Resting", ["order_id", "customer_id", "price", "quantity", "filled_quantity"])
+
+
+def crosses(order_type: OrderType, limit_price: Optional[float], resting_price: float) -> bool:
+    """Whether an incoming order at ``limit_price`` can trade at ``resting_price``.
+
+    A ``limit_price`` of None (a triggered stop-market order) crosses any price.
+    """
+    if limit_price is None:
+        return True
+    if order_type == OrderType.BUY:
+        return resting_price <= limit_price
+    return resting_price >= limit_price
+
+
+def sweep(
+    order_type: OrderType,
+    limit_price: Optional[float],
+    quantity: float,
+    resting: Iterable[Resting],
+    customer_id: Optional[int] = None,
+    stp: SelfTradePrevention = SelfTradePrevention.NONE,
+) -> Sweep:
+    """Match an incoming order against resting orders given in priority order.
+
+    Trades execute at the resting order's price. Iteration stops at the first
+    resting order that no longer crosses or once ``quantity`` is exhausted.
+    """
+    fills = []
+    preventions = []
+    decremented = 0.0
+    remaining_quantity = quantity
+    prevent = stp != SelfTradePrevention.NONE and customer_id is not None
+
+    for maker in resting:
+        if remaining_quantity <= 0:
+            break
+        if not crosses(order_type, limit_price, maker.price):
+            break
+
+        match_quantity = min(remaining_quantity, maker.quantity - maker.filled_quantity)
+        if match_quantity <= 0:
+            continue
+
+        if prevent and maker.customer_id == customer_id:
+            if stp == SelfTradePrevention.CANCEL_NEWEST:
+                return Sweep(fills, preventions, decremented, True)
+            if stp == SelfTradePrevention.CANCEL_OLDEST:
+                preventions.append(Prevention(maker.order_id, 0.0, True))
+                continue
+            preventions.append(Prevention(maker.order_id, match_quantity, False))
+            decremented += match_quantity
+            remaining_quantity -= match_quantity
+            continue
+
+        fills.append(Fill(maker.order_id, maker.price, match_quantity))
+        remaining_quantity -= match_quantity
+
+    return Sweep(fills, preventions, decremented, False)
+
+
+class _Entry:
+    """A resting order inside a price level queue."""
+
+    __slots__ = ("order_id", "customer_id", "order_type", "price", "quantity", "filled_quantity")
+
+    def __init__(self, order_id, customer_id, order_type, price, quantity, filled_quantity):
+        self.order_id = order_id
+        self.customer_id = customer_id
+        self.order_type = order_type
+        self.price = price
+        self.quantity = quantity
+        self.filled_quantity = filled_quantity
+
+    @property
+    def remaining(self) -> float:
+        return self.quantity - self.filled_quantity
+
+
+class PriceLevelBook:
+    """In-memory order book for one commodity.
+
+    Each side keeps a FIFO queue per price level and a sorted list of the
+    level prices, so the best price is found in O(1), inserting a new level
+    is O(log n) plus a list insert, and cancels are O(1) via an order index
+    (cancelled entries are dropped lazily when they reach the queue front).
+    """
+
+    def __init__(self, commodity_id: Optional[int] = None, stp: SelfTradePrevention = DEFAULT_STP):
+        self.commodity_id = commodity_id
+        self.stp = stp
+        self.levels = {OrderType.BUY: {}, OrderType.SELL: {}}
+        self.prices = {OrderType.BUY: [], OrderType.SELL: []}
+        self.depth = {OrderType.BUY: {}, OrderType.SELL: {}}
+        self.orders: Dict[int, _Entry] = {}
+        # Optional change listener, e.g. a market data EventRing
+        self.listener = None
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self.orders
+
+    def best_price(self, order_type: OrderType) -> Optional[float]:
+        prices = self.prices[order_type]
+        if not prices:
+            return None
+        return prices[-1] if order_type == OrderType.BUY else prices[0]
+
+    def rest(
+        self,
+        order_id: int,
+        customer_id: int,
+        order_type: OrderType,
+        price: float,
+        quantity: float,
+        filled_quantity: float = 0.0,
+        by_id: bool = False,
+    ):
+        """Place an order at the back of its price level without matching it.
+
+        With ``by_id`` the order is queued behind lower order ids only: a
+        triggered stop order keeps the time priority of its submission, as
+        the database's (created_at, id) ordering does.
+        """
+        entry = _Entry(order_id, customer_id, order_type, price, quantity, filled_quantity)
+        depth = self.depth[order_type]
+        level_before = depth.get(price, 0.0)
+        queue = self.levels[order_type].get(price)
+        if queue is None:
+            queue = self.levels[order_type][price] = deque()
+            insort(self.prices[order_type], price)
+            depth[price] = 0.0
+        if by_id and queue and queue[-1].order_id > order_id:
+            queue.insert(next(i for i, e in enumerate(queue) if e.order_id > order_id), entry)
+        else:
+            queue.append(entry)
+        depth[price] += entry.remaining
+        self.orders[order_id] = entry
+        self._notify("add", entry, entry.remaining, level_before)
+
+    def iter_resting(self, order_type: OrderType) -> Iterable[_Entry]:
+        """Yield live resting orders of one side in price-time priority."""
+        prices = self.prices[order_type]
+        ordered = reversed(prices) if order_type == OrderType.BUY else iter(prices)
+        for price in ordered:
+            for entry in self.levels[order_type][price]:
+                if entry.order_id in self.orders:
+                    yield entry
+
+    def match(
+        self,
+        order_type: OrderType,
+        price: Optional[float],
+        quantity: float,
+        customer_id: Optional[int] = None,
+    ) -> Sweep:
+        """Match an incoming order against the opposite side and apply the result."""
+        opposite_type = OrderType.SELL if order_type == OrderType.BUY else OrderType.BUY
+        result = sweep(
+            order_type, price, quantity, self.iter_resting(opposite_type), customer_id, self.stp
+        )
+        for prevention in result.preventions:
+            if prevention.cancel_maker:
+                self.cancel(prevention.maker_id)
+            else:
+                entry = self.orders[prevention.maker_id]
+                self.amend(entry.order_id, entry.quantity - prevention.quantity, entry.filled_quantity)
+        for fill in result.fills:
+            self.fill(fill.maker_id, fill.quantity)
+        return result
+
+    def add(
+        self,
+        order_id: int,
+        customer_id: int,
+        order_type: OrderType,
+        price: Optional[float],
+        quantity: float,
+        by_id: bool = False,
+    ) -> List[Fill]:
+        """Match a new order and rest any remaining quantity.
+
+        A market order (no price) takes any price and never rests. ``by_id``
+        is passed on to ``rest``.
+        """
+        result = self.match(order_type, price, quantity, customer_id)
+        filled_quantity = 0.0
+        for fill in result.fills:
+            filled_quantity += fill.quantity
+        quantity -= result.decremented
+        if price is not None and not result.cancelled and filled_quantity < quantity:
+            self.rest(order_id, customer_id, order_type, price, quantity, filled_quantity, by_id)
+        return result.fills
+
+    def fill(self, order_id: int, quantity: float):
+        """Apply an execution to a resting order, removing it once fully filled."""
+        entry = self.orders[order_id]
+        depth = self.depth[entry.order_type]
+        level_before = depth[entry.price]
+        entry.filled_quantity += quantity
+        depth[entry.price] -= quantity
+        if entry.filled_quantity >= entry.quantity:
+            self._remove(entry)
+            self._notify("delete", entry, 0.0, level_before)
+        else:
+            self._notify("reduce", entry, entry.remaining, level_before)
+
+    def amend(self, order_id: int, quantity: float, filled_quantity: float):
+        """Overwrite a resting order's quantities in place, keeping its queue position."""
+        entry = self.orders[order_id]
+        depth = self.depth[entry.order_type]
+        level_before = depth[entry.price]
+        remaining_before = entry.remaining
+        depth[entry.price] -= remaining_before
+        entry.quantity = quantity
+        entry.filled_quantity = filled_quantity
+        if entry.filled_quantity >= entry.quantity:
+            self._remove(entry)
+            self._notify("delete", entry, 0.0, level_before)
+        else:
+            depth[entry.price] += entry.remaining
+            action = "add" if entry.remaining > remaining_before else "reduce"
+            self._notify(action, entry, entry.remaining, level_before)
+
+    def cancel(self, order_id: int) -> bool:
+        """Remove a resting order. Returns False if the order is not in the book."""
+        entry = self.orders.get(order_id)
+        if entry is None:
+            return False
+        depth = self.depth[entry.order_type]
+        level_before = depth[entry.price]
+        depth[entry.price] -= entry.remaining
+        self._remove(entry)
+        self._notify("delete", entry, 0.0, level_before)
+        return True
+
+    def _notify(self, action: str, entry: _Entry, remaining: float, level_before: float):
+        if self.listener is not None:
+            self.listener.book_changed(
+                action,
+                entry.order_type,
+                entry.price,
+                entry.order_id,
+                remaining,
+                level_before,
+                self.depth[entry.order_type].get(entry.price),
+            )
+
+    def _remove(self, entry: _Entry):
+        del self.orders[entry.order_id]
+        order_type, price = entry.order_type, entry.price
+        queue = self.levels[order_type][price]
+        while queue and queue[0].order_id not in self.orders:
+            queue.popleft()
+        if not queue:
+            del self.levels[order_type][price]
+            del self.depth[order_type][price]
+            prices = self.prices[order_type]
+            del prices[bisect_left(prices, price)]
+
+    def entries(self) -> List[tuple]:
+        """Resting orders as (order_id, customer_id, order_type, price, quantity,
+        filled_quantity) tuples, bids then asks, in queue order within each level.
+
+        Every level queue is copied before it is read, so this is safe to call
+        while another thread keeps matching.
+        """
+        result = []
+        for order_type in (OrderType.BUY, OrderType.SELL):
+            levels = self.levels[order_type]
+            for price in list(self.prices[order_type]):
+                for entry in list(levels.get(price, ())):
+                    if entry.order_id in self.orders:
+                        result.append((
+                            entry.order_id,
+                            entry.customer_id,
+                            entry.order_type,
+                            entry.price,
+                            entry.quantity,
+                            entry.filled_quantity,
+                        ))
+        return result
+
+    def snapshot(self) -> Dict:
+        """Aggregated depth in the same shape as ``OrderBook.get_order_book_snapshot``."""
+        bids = self.depth[OrderType.BUY]
+        asks = self.depth[OrderType.SELL]
+        return {
+            "commodity_id": self.commodity_id,
+            "bids": [{"price": p, "quantity": bids[p]} for p in reversed(self.prices[OrderType.BUY])],
+            "asks": [{"price": p, "quantity": asks[p]} for p in self.prices[OrderType.SELL]],
+        }
+
+
+
+class TriggerBook:
+    """Pending stop orders for one commodity, indexed by stop price.
+
+    A buy stop triggers once the last trade price rises to its stop price, a
+    sell stop once it falls to it. Each side is a heap keyed so that the stop
+    nearest the market is on top, so a price change pops exactly the
+    triggered range instead of scanning every pending order. Cancels are
+    lazy: the order is forgotten and its heap entry skipped when popped.
+    """
+
+    def __init__(self, commodity_id: Optional[int] = None, last_price: Optional[float] = None):
+        self.commodity_id = commodity_id
+        self.last_price = last_price
+        self.heaps = {OrderType.BUY: [], OrderType.SELL: []}
+        self.pending: Dict[int, OrderType] = {}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self.pending
+
+    def triggered(self, order_type: OrderType, stop_price: float, price: Optional[float] = None) -> bool:
+        """Whether a stop at ``stop_price`` triggers at ``price`` (default: the last trade price)."""
+        if price is None:
+            price = self.last_price
+        if price is None:
+            return False
+        if order_type == OrderType.BUY:
+            return price >= stop_price
+        return price <= stop_price
+
+    def add(self, order_id: int, order_type: OrderType, stop_price: float):
+        """Park a stop order until its stop price is reached."""
+        # Sell stops trigger from the highest stop down, so negate for the min-heap
+        key = stop_price if order_type == OrderType.BUY else -stop_price
+        heappush(self.heaps[order_type], (key, order_id))
+        self.pending[order_id] = order_type
+
+    def cancel(self, order_id: int) -> bool:
+        """Forget a pending stop order. Returns False if it is not pending."""
+        order_type = self.pending.pop(order_id, None)
+        if order_type is None:
+            return False
+        heap = self.heaps[order_type]
+        # Drop dead entries once they dominate the heap
+        if len(heap) > 64 and len(heap) > 2 * len(self.pending):
+            heap[:] = [item for item in heap if item[1] in self.pending]
+            heapify(heap)
+        return True
+
+    def on_trades(self, prices: Iterable[float]) -> List[int]:
+        """Record trade prices and pop the stop orders they trigger.
+
+        Triggered order ids are returned in time priority (ascending id).
+        """
+        prices = list(prices)
+        if not prices:
+            return []
+        self.last_price = prices[-1]
+        high = max(prices)
+        low = min(prices)
+
+        triggered = []
+        heap = self.heaps[OrderType.BUY]
+        while heap and heap[0][0] <= high:
+            order_id = heappop(heap)[1]
+            if self.pending.pop(order_id, None) is not None:
+                triggered.append(order_id)
+        heap = self.heaps[OrderType.SELL]
+        while heap and -heap[0][0] >= low:
+            order_id = heappop(heap)[1]
+            if self.pending.pop(order_id, None) is not None:
+                triggered.append(order_id)
+        triggered.sort()
+        return triggered
@@ -1,129 +1,239 @@
+from datetime import datetime
+from sqlalchemy import bindparam
 from sqlalchemy.orm import Session
 from models import Order, OrderType, OrderStatus, Trade
-from typing import List, Dict, Tuple
+from database.books import OPEN_STATUSES, BookRegistry, books
+from database.matching import DEFAULT_STP, Fill, Resting, SelfTradePrevention, TriggerBook, sweep
+from typing import List, Dict, Optional, Tuple
+
+# One executemany UPDATE for every resting order a sweep touched; updated_at
+# is set by the column's onupdate
+_orders = Order.__table__
+_UPDATE_MAKER = (
+    _orders.update()
+    .where(_orders.c.id == bindparam("maker_id"))
+    .values(
+        quantity=bindparam("new_quantity"),
+        filled_quantity=bindparam("new_filled"),
+        status=bindparam("new_status", type_=_orders.c.status.type),
+    )
+)
 
 
 class OrderBook:
     """OrderBook implementation for handling order matching and execution."""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        stp: Optional[SelfTradePrevention] = None,
+        registry: Optional[BookRegistry] = None,
+    ):
         self.db = db
+        # Self-trade prevention mode, see database.matching
+        self.stp = stp or DEFAULT_STP
+        # In-memory books, locks and stop triggers; the process-wide ones by default
+        self.books = registry if registry is not None else books
     
     def add_order(self, order: Order) -> Tuple[Order, List[Trade]]:
-        """Add a new order to the order book and try to match it with existing orders."""
-        # Save the order to DB first
-        self.db.add(order)
-        self.db.commit()
-        self.db.refresh(order)
+        """Add a new order to the order book and try to match it with existing orders.
+        
+        An order with a ``stop_price`` is stored as PENDING and only matched
+        once the last trade price reaches its stop. The returned trades are
+        the new order's own; stop orders it triggers are matched in the same
+        call and their trades are only persisted.
+        """
+        # Matching within one commodity is serialized; other commodities
+        # match concurrently on a server database
+        with self.books.lock(order.commodity_id):
+            triggers = self.books.triggers(self.db, order.commodity_id)
+            if order.stop_price is not None:
+                order.status = OrderStatus.PENDING
+            
+            # Insert the order to assign its id; it is committed together
+            # with its fills
+            self.db.add(order)
+            self.db.flush()
+            
+            # A stop already through the last price activates straight away
+            if order.status == OrderStatus.PENDING and not triggers.triggered(
+                order.order_type, order.stop_price
+            ):
+                self.db.commit()
+                triggers.add(order.id, order.order_type, order.stop_price)
+                return order, []
+            
+            trades = self._execute(order)
+            self._activate_stops(triggers, trades)
+        
+        return order, trades
+    
+    def _execute(self, order: Order) -> List[Trade]:
+        """Match a saved order, settle its status and mirror it in memory."""
+        if order.status == OrderStatus.PENDING:
+            order.status = OrderStatus.OPEN
         
         # Try to match the order
-        trades = self.match_order(order)
+        fills, makers = self._match(order)
         
-        # Update order status based on matches
-        if trades:
-            if order.filled_quantity >= order.quantity:
-                order.status = OrderStatus.FILLED
-            else:
-                order.status = OrderStatus.PARTIAL
+        # Update order status based on matches; self-trade prevention may
+        # already have cancelled it or decremented its quantity
+        if order.status != OrderStatus.CANCELLED:
+            order.status = self._status(order.quantity, order.filled_quantity)
+            # A triggered stop-market order never rests
+            if order.price is None and order.status in OPEN_STATUSES:
+                order.status = OrderStatus.CANCELLED
         
         self.db.commit()
-        self.db.refresh(order)
         
-        return order, trades
+        # Keep the in-memory book in step with the database
+        self.books.record_order(order, makers)
+        return self._trades(order) if fills else []
+    
+    def _activate_stops(self, triggers: TriggerBook, trades: List[Trade]):
+        """Match the stop orders triggered by ``trades``, and by their own trades in turn."""
+        while trades:
+            order_ids = triggers.on_trades(trade.price for trade in trades)
+            trades = []
+            for order_id in order_ids:
+                stop_order = self.db.get(Order, order_id)
+                if stop_order is None or stop_order.status != OrderStatus.PENDING:
+                    continue
+                trades.extend(self._execute(stop_order))
+    
+    @staticmethod
+    def _status(quantity: float, filled_quantity: float) -> OrderStatus:
+        """Status implied by an order's filled quantity."""
+        if filled_quantity >= quantity:
+            # Decremented to nothing without a single fill
+            return OrderStatus.FILLED if filled_quantity > 0 else OrderStatus.CANCELLED
+        if filled_quantity > 0:
+            return OrderStatus.PARTIAL
+        return OrderStatus.OPEN
+    
+    def _trades(self, order: Order) -> List[Trade]:
+        """The committed trades of an incoming order, in execution order."""
+        return self.db.query(Trade).filter(Trade.order_id == order.id).order_by(Trade.id).all()
     
     def match_order(self, order: Order) -> List[Trade]:
         """Match an order with existing orders in the book."""
-        trades = []
+        fills, _ = self._match(order)
+        self.db.commit()
+        return self._trades(order) if fills else []
+    
+    def _match(self, order: Order) -> Tuple[List[Fill], List[Tuple]]:
+        """Match an order and write the result without committing.
         
+        Returns the fills plus the final (id, quantity, filled_quantity,
+        status) of every resting order touched. The resting orders are read
+        as plain rows and written back with one executemany UPDATE, and the
+        trades with one executemany INSERT, however deep the sweep goes.
+        """
         # Determine which orders to match against based on order type
         opposite_type = OrderType.SELL if order.order_type == OrderType.BUY else OrderType.BUY
         
-        # Query for matching orders
+        # Query for matching orders, row-locking them where the database
+        # supports it, so matchers in other processes cannot fill the same orders
+        query = self.db.query(
+            Order.id, Order.customer_id, Order.price, Order.quantity, Order.filled_quantity
+        ).filter(
+            Order.commodity_id == order.commodity_id,
+            Order.order_type == opposite_type,
+            Order.status.in_([OrderStatus.OPEN, OrderStatus.PARTIAL])
+        )
+        
         # For buy orders, we want to match with sell orders with price <= buy price (sorted by lowest price first)
         # For sell orders, we want to match with buy orders with price >= sell price (sorted by highest price first)
+        # A stop-market order (no price) takes any price
         if order.order_type == OrderType.BUY:
-            matching_orders = (
-                self.db.query(Order)
-                .filter(
-                    Order.commodity_id == order.commodity_id,
-                    Order.order_type == opposite_type,
-                    Order.status.in_([OrderStatus.OPEN, OrderStatus.PARTIAL]),
-                    Order.price <= order.price
-                )
-                .order_by(Order.price, Order.created_at)
-                .all()
-            )
+            if order.price is not None:
+                query = query.filter(Order.price <= order.price)
+            query = query.order_by(Order.price, Order.created_at, Order.id)
         else:  # SELL order
-            matching_orders = (
-                self.db.query(Order)
-                .filter(
-                    Order.commodity_id == order.commodity_id,
-                    Order.order_type == opposite_type,
-                    Order.status.in_([OrderStatus.OPEN, OrderStatus.PARTIAL]),
-                    Order.price >= order.price
-                )
-                .order_by(Order.price.desc(), Order.created_at)
-                .all()
-            )
+            if order.price is not None:
+                query = query.filter(Order.price >= order.price)
+            query = query.order_by(Order.price.desc(), Order.created_at, Order.id)
+        
+        resting = [Resting(*row) for row in query.with_for_update()]
         
         # Match with orders until our order is filled or no more matches
-        remaining_quantity = order.quantity
+        result = sweep(
+            order.order_type,
+            order.price,
+            order.quantity,
+            resting,
+            order.customer_id,
+            self.stp
+        )
         
-        for matching_order in matching_orders:
-            if remaining_quantity <= 0:
-                break
-                
-            # Calculate the matched quantity
-            match_quantity = min(
-                remaining_quantity,
-                matching_order.quantity - matching_order.filled_quantity
-            )
-            
-            if match_quantity <= 0:
-                continue
-                
-            # Create a trade
-            # Use the price of the existing order in the book (price-time priority)
-            trade = Trade(
-                order_id=order.id,
-                counterparty_order_id=matching_order.id,
-                price=matching_order.price,
-                quantity=match_quantity
-            )
-            
-            # Update the filled quantities
-            order.filled_quantity += match_quantity
-            matching_order.filled_quantity += match_quantity
-            
-            # Update the matching order status
-            if matching_order.filled_quantity >= matching_order.quantity:
-                matching_order.status = OrderStatus.FILLED
+        # Final state of each resting order touched, in the order touched
+        makers = {o.order_id: o for o in resting}
+        touched: Dict[int, List] = {}
+        
+        # Apply self-trade prevention: no trade is recorded for these
+        for prevention in result.preventions:
+            maker = makers[prevention.maker_id]
+            state = touched.setdefault(prevention.maker_id, [maker.quantity, maker.filled_quantity, None])
+            if prevention.cancel_maker:
+                state[2] = OrderStatus.CANCELLED
             else:
-                matching_order.status = OrderStatus.PARTIAL
+                state[0] -= prevention.quantity
+                state[2] = self._status(state[0], state[1])
+        
+        if result.decremented:
+            order.quantity -= result.decremented
+        if result.cancelled:
+            order.status = OrderStatus.CANCELLED
+        
+        # Use the price of the existing order in the book (price-time priority)
+        executed_at = datetime.utcnow()
+        trade_rows = []
+        for fill in result.fills:
+            maker = makers[fill.maker_id]
+            state = touched.setdefault(fill.maker_id, [maker.quantity, maker.filled_quantity, None])
             
-            # Save the trade
-            self.db.add(trade)
-            trades.append(trade)
+            # Update the filled quantities
+            order.filled_quantity += fill.quantity
+            state[1] += fill.quantity
+            state[2] = self._status(state[0], state[1])
             
-            # Update remaining quantity
-            remaining_quantity -= match_quantity
+            trade_rows.append({
+                "order_id": order.id,
+                "counterparty_order_id": fill.maker_id,
+                "price": fill.price,
+                "quantity": fill.quantity,
+                "executed_at": executed_at,
+            })
         
-        # Commit all changes
-        self.db.commit()
+        # Set-based writes on the session's connection; the incoming order
+        # itself is flushed as usual on commit
+        connection = self.db.connection()
+        if touched:
+            connection.execute(_UPDATE_MAKER, [
+                {"maker_id": maker_id, "new_quantity": q, "new_filled": f, "new_status": status}
+                for maker_id, (q, f, status) in touched.items()
+            ])
+        if trade_rows:
+            connection.execute(Trade.__table__.insert(), trade_rows)
         
-        return trades
+        maker_states = [(maker_id, q, f, status) for maker_id, (q, f, status) in touched.items()]
+        return result.fills, maker_states
     
     def cancel_order(self, order_id: int) -> Order:
-        """Cancel an order if it's still open or partially filled."""
+        """Cancel an order if it's still open, partially filled or a pending stop."""
         order = self.db.query(Order).filter(Order.id == order_id).first()
         
         if not order:
             raise ValueError(f"Order with ID {order_id} not found")
-            
-        if order.status in [OrderStatus.OPEN, OrderStatus.PARTIAL]:
-            order.status = OrderStatus.CANCELLED
-            self.db.commit()
+        
+        with self.books.lock(order.commodity_id):
+            # Re-read under the lock: the order may have been filled meanwhile
             self.db.refresh(order)
+            if order.status in [OrderStatus.OPEN, OrderStatus.PARTIAL, OrderStatus.PENDING]:
+                order.status = OrderStatus.CANCELLED
+                self.db.commit()
+                self.db.refresh(order)
+                self.books.record_cancel(order)
             
         return order
     
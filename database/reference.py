@@ -0,0 +1,114 @@
+"""In-process cache of reference data: commodities and customer profiles.
+
+Commodities almost never change but are fetched on every login, so their
+JSON responses are serialized once and served as bytes. The cache is loaded
+at warm-up and rebuilt on the next read after ``invalidate_commodities``,
+which the API calls after creating a commodity. Entries also expire after
+``REFERENCE_CACHE_TTL`` seconds, so other server processes pick up changes
+they did not make themselves.
+
+Customer profiles (``Customer.to_dict``) are cached by id. They do not
+change after registration, so new customers are simply added.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Commodity, Customer
+
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", 60))
+
+
+def _serialize(payload) -> bytes:
+    # Same body the JSON representation of flask-restful produces
+    return (json.dumps(payload) + "\n").encode()
+
+
+class ReferenceCache:
+    """Precomputed JSON payloads for commodities and customer profiles."""
+
+    def __init__(self, ttl: float = REFERENCE_CACHE_TTL):
+        self.ttl = ttl
+        # (list payload, payload by id, loaded at), swapped as a whole
+        self._commodities: Optional[Tuple[bytes, Dict[int, bytes], float]] = None
+        self._customers: Dict[int, bytes] = {}
+        # Bumped by invalidation so a reload that raced it is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> Dict:
+        """Load all commodities and customer profiles. Returns the counts."""
+        _, commodities, _ = self.load_commodities(db)
+        customers = {c.id: _serialize(c.to_dict()) for c in db.query(Customer)}
+        with self._lock:
+            self._customers = customers
+        return {"commodities": len(commodities), "customers": len(customers)}
+
+    def load_commodities(self, db: Session) -> Tuple[bytes, Dict[int, bytes], float]:
+        """Rebuild the commodity payloads from the database."""
+        # The lock is not held over the query: under the async server the
+        # query yields to other requests on the same thread
+        generation = self._generation
+        rows = [c.to_dict() for c in db.query(Commodity).order_by(Commodity.id)]
+        commodities = (
+            _serialize(rows),
+            {row["id"]: _serialize(row) for row in rows},
+            time.monotonic(),
+        )
+        with self._lock:
+            if generation == self._generation:
+                self._commodities = commodities
+        return commodities
+
+    def _get_commodities(self, db: Session) -> Tuple[bytes, Dict[int, bytes], float]:
+        commodities = self._commodities
+        if commodities is None or time.monotonic() - commodities[2] >= self.ttl:
+            commodities = self.load_commodities(db)
+        return commodities
+
+    def commodity_list(self, db: Session) -> bytes:
+        """JSON list of all commodities."""
+        return self._get_commodities(db)[0]
+
+    def commodity(self, db: Session, commodity_id: int) -> Optional[bytes]:
+        """JSON for one commodity, or None if it does not exist."""
+        payload = self._get_commodities(db)[1].get(commodity_id)
+        if payload is None and db.query(Commodity.id).filter(Commodity.id == commodity_id).first():
+            # Created by another process since the last load
+            payload = self.load_commodities(db)[1].get(commodity_id)
+        return payload
+
+    def invalidate_commodities(self):
+        """Drop the commodity payloads; call after committing a change."""
+        with self._lock:
+            self._generation += 1
+            self._commodities = None
+
+    def customer(self, db: Session, customer_id: int) -> Optional[bytes]:
+        """JSON profile of a customer, or None if it does not exist."""
+        payload = self._customers.get(customer_id)
+        if payload is None:
+            customer = db.query(Customer).filter(Customer.id == customer_id).first()
+            if customer is not None:
+                payload = self.add_customer(customer)
+        return payload
+
+    def add_customer(self, customer: Customer) -> bytes:
+        """Cache a committed customer's profile and return it."""
+        payload = _serialize(customer.to_dict())
+        with self._lock:
+            self._customers[customer.id] = payload
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._commodities = None
+            self._customers = {}
+
+
+reference = ReferenceCache()
@@ -0,0 +1,396 @@
+"""Deterministic order-flow replay for backtesting the matching engine.
+
+An event file is JSON lines, one event per line::
+
+    {"event": "order", "order_id": 1, "customer_id": 1, "commodity_id": 1,
+     "order_type": "buy", "price": 1900.0, "quantity": 10.0}
+    {"event": "cancel", "order_id": 1}
+
+``order_id`` is optional on order events; missing ids are assigned
+sequentially from 1, the way the ``orders`` table autoincrements. Stop
+orders carry a ``stop_price`` and, for a stop-market order, a null
+``price``; they wait in a ``TriggerBook`` until the last trade price
+reaches the stop, exactly as in ``OrderBook``.
+
+Events are replayed through ``PriceLevelBook`` with no persistence at all,
+and the resulting trades are folded into a SHA-256 digest so runs can be
+compared across engine changes. ``replay_through_order_book`` runs the same
+events through the database-backed ``OrderBook`` on an in-memory SQLite
+database, to check that both paths agree.
+
+Usage::
+
+    python -m database.replay generate 1000000 events.jsonl
+    python -m database.replay run events.jsonl --expect-digest <hex>
+    python -m database.replay run events.jsonl --verify-orm
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.matching import DEFAULT_STP, PriceLevelBook, SelfTradePrevention, TriggerBook
+from models import OrderType
+
+# Mirrors a row of the trades table: order_id is the taker, counterparty the maker
+TradeRecord = namedtuple("TradeRecord", ["order_id", "counterparty_order_id", "price", "quantity"])
+
+ReplayResult = namedtuple("ReplayResult", ["events", "trades", "digest", "elapsed"])
+
+
+def read_events(path: str) -> Iterator[Dict]:
+    """Read events from a JSON lines file, skipping blank lines."""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid event: {e}")
+
+
+def write_events(path: str, events: Iterable[Dict]):
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event, separators=(",", ":")))
+            f.write("\n")
+
+
+def generate_events(
+    count: int,
+    commodities: int = 1,
+    customers: int = 10,
+    cancel_ratio: float = 0.2,
+    seed: int = 0,
+    stop_ratio: float = 0.0,
+) -> Iterator[Dict]:
+    """Generate a reproducible random order flow around a mid price of 100.
+
+    A ``stop_ratio`` share of the orders are stop orders a little away from
+    the mid, half of them stop-market. With the default of zero the flow is
+    the same as before stop orders existed.
+    """
+    rng = random.Random(seed)
+    open_ids = []
+    next_id = 1
+    for _ in range(count):
+        if open_ids and rng.random() < cancel_ratio:
+            index = rng.randrange(len(open_ids))
+            open_ids[index], open_ids[-1] = open_ids[-1], open_ids[index]
+            yield {"event": "cancel", "order_id": open_ids.pop()}
+            continue
+
+        order_type = rng.choice((OrderType.BUY, OrderType.SELL))
+        offset = rng.randint(-10, 10) / 10
+        event = {
+            "event": "order",
+            "order_id": next_id,
+            "customer_id": rng.randint(1, customers),
+            "commodity_id": rng.randint(1, commodities),
+            "order_type": order_type.value,
+            "price": round(100.0 + offset, 1),
+            "quantity": float(rng.randint(1, 20)),
+        }
+        if stop_ratio and rng.random() < stop_ratio:
+            # Buy stops above the mid, sell stops below it
+            distance = rng.randint(1, 8) / 10
+            stop_price = 100.0 + distance if order_type == OrderType.BUY else 100.0 - distance
+            event["stop_price"] = round(stop_price, 1)
+            event["price"] = None if rng.random() < 0.5 else round(stop_price, 1)
+        yield event
+        open_ids.append(next_id)
+        next_id += 1
+
+
+class _Digest:
+    """Order-sensitive digest of a trade sequence."""
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+
+    def update(self, trade: TradeRecord):
+        self._hash.update(
+            f"{trade.order_id},{trade.counterparty_order_id},{trade.price!r},{trade.quantity!r}\n".encode()
+        )
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class ReplayEngine:
+    """Replays events through one in-memory ``PriceLevelBook`` per commodity."""
+
+    def __init__(self, stp: SelfTradePrevention = DEFAULT_STP):
+        self.stp = stp
+        self.books: Dict[int, PriceLevelBook] = {}
+        self.triggers: Dict[int, TriggerBook] = {}
+        self.order_commodity: Dict[int, int] = {}
+        # Pending stop orders: order id -> (customer id, type, price, quantity)
+        self.stops: Dict[int, tuple] = {}
+        self._next_order_id = 1
+
+    def book(self, commodity_id: int) -> PriceLevelBook:
+        book = self.books.get(commodity_id)
+        if book is None:
+            book = self.books[commodity_id] = PriceLevelBook(commodity_id, self.stp)
+        return book
+
+    def trigger_book(self, commodity_id: int) -> TriggerBook:
+        trigger_book = self.triggers.get(commodity_id)
+        if trigger_book is None:
+            trigger_book = self.triggers[commodity_id] = TriggerBook(commodity_id)
+        return trigger_book
+
+    def apply(self, event: Dict) -> List[TradeRecord]:
+        """Apply a single event and return the trades it produced.
+
+        These include the trades of stop orders the event triggered, in
+        execution order.
+        """
+        kind = event.get("event")
+        if kind == "order":
+            order_id = event.get("order_id") or self._next_order_id
+            self._next_order_id = max(self._next_order_id, order_id + 1)
+            commodity_id = event["commodity_id"]
+            order_type = OrderType(event["order_type"])
+            price, stop_price = _prices(event)
+            self.order_commodity[order_id] = commodity_id
+
+            # A stop already through the last price activates straight away
+            triggers = self.trigger_book(commodity_id)
+            if stop_price is not None and not triggers.triggered(order_type, stop_price):
+                triggers.add(order_id, order_type, stop_price)
+                self.stops[order_id] = (event["customer_id"], order_type, price, float(event["quantity"]))
+                return []
+
+            trades = self._execute(
+                commodity_id, order_id, event["customer_id"], order_type, price, float(event["quantity"]),
+                stop=stop_price is not None,
+            )
+            return trades + self._activate_stops(commodity_id, trades)
+        if kind == "cancel":
+            commodity_id = self.order_commodity.get(event["order_id"])
+            if commodity_id is not None:
+                self.book(commodity_id).cancel(event["order_id"])
+                if self.stops.pop(event["order_id"], None) is not None:
+                    self.triggers[commodity_id].cancel(event["order_id"])
+            return []
+        raise ValueError(f"Invalid event: {kind}. Must be one of: ['order', 'cancel']")
+
+    def _execute(
+        self, commodity_id, order_id, customer_id, order_type, price, quantity, stop: bool = False
+    ) -> List[TradeRecord]:
+        # A triggered stop keeps its submission priority, as in the database
+        fills = self.book(commodity_id).add(order_id, customer_id, order_type, price, quantity, by_id=stop)
+        return [TradeRecord(order_id, fill.maker_id, fill.price, fill.quantity) for fill in fills]
+
+    def _activate_stops(self, commodity_id: int, trades: List[TradeRecord]) -> List[TradeRecord]:
+        """Execute the stops triggered by ``trades``, and by their own trades in turn."""
+        activated = []
+        while trades:
+            order_ids = self.triggers[commodity_id].on_trades(trade.price for trade in trades)
+            trades = []
+            for order_id in order_ids:
+                stop = self.stops.pop(order_id, None)
+                if stop is not None:
+                    trades.extend(self._execute(commodity_id, order_id, *stop, stop=True))
+            activated.extend(trades)
+        return activated
+
+
+def _prices(event: Dict):
+    """The (limit price, stop price) of an order event; either may be None, not both."""
+    price = event.get("price")
+    stop_price = event.get("stop_price")
+    if price is None and stop_price is None:
+        raise ValueError(f"Order event {event.get('order_id')} needs a price or a stop_price")
+    return (
+        None if price is None else float(price),
+        None if stop_price is None else float(stop_price),
+    )
+
+
+def replay(
+    events: Iterable[Dict],
+    collect_trades: bool = False,
+    stp: SelfTradePrevention = DEFAULT_STP,
+) -> ReplayResult:
+    """Replay events through the in-memory engine.
+
+    Trades are always folded into the digest; they are only kept in the
+    result when ``collect_trades`` is set, so long replays run in constant
+    memory apart from the books themselves.
+    """
+    engine = ReplayEngine(stp)
+    digest = _Digest()
+    trades = [] if collect_trades else None
+    count = 0
+
+    start = time.perf_counter()
+    for event in events:
+        for trade in engine.apply(event):
+            digest.update(trade)
+            if collect_trades:
+                trades.append(trade)
+        count += 1
+    elapsed = time.perf_counter() - start
+
+    return ReplayResult(count, trades, digest.hexdigest(), elapsed)
+
+
+def replay_through_order_book(
+    events: Iterable[Dict],
+    stp: SelfTradePrevention = DEFAULT_STP,
+) -> ReplayResult:
+    """Replay events through ``OrderBook`` on a throwaway in-memory SQLite database.
+
+    Trade order ids are reported as event order ids, so the digest is
+    comparable with ``replay``. Trades are read back from the ``trades``
+    table, so those of triggered stop orders are included in execution order.
+    """
+    from database.books import BookRegistry
+    from database.db import Base
+    from database.order_book import OrderBook
+    from models import Order, OrderStatus, Trade
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    # A private registry keeps the throwaway database's state out of the
+    # process-wide books
+    order_book = OrderBook(db, stp, BookRegistry())
+    db_ids: Dict[int, int] = {}
+    event_ids: Dict[int, int] = {}
+    next_order_id = 1
+    last_trade_id = 0
+    digest = _Digest()
+    trades = []
+    count = 0
+
+    start = time.perf_counter()
+    try:
+        for event in events:
+            count += 1
+            if event.get("event") == "cancel":
+                if event["order_id"] in db_ids:
+                    order_book.cancel_order(db_ids[event["order_id"]])
+                continue
+
+            order_id = event.get("order_id") or next_order_id
+            next_order_id = max(next_order_id, order_id + 1)
+            price, stop_price = _prices(event)
+            order, _ = order_book.add_order(Order(
+                customer_id=event["customer_id"],
+                commodity_id=event["commodity_id"],
+                order_type=OrderType(event["order_type"]),
+                price=price,
+                stop_price=stop_price,
+                quantity=float(event["quantity"]),
+                filled_quantity=0.0,
+                status=OrderStatus.OPEN,
+            ))
+            db_ids[order_id] = order.id
+            event_ids[order.id] = order_id
+
+            for trade_id, taker_id, maker_id, trade_price, quantity in (
+                db.query(Trade.id, Trade.order_id, Trade.counterparty_order_id, Trade.price, Trade.quantity)
+                .filter(Trade.id > last_trade_id)
+                .order_by(Trade.id)
+            ):
+                record = TradeRecord(event_ids[taker_id], event_ids[maker_id], trade_price, quantity)
+                digest.update(record)
+                trades.append(record)
+                last_trade_id = trade_id
+    finally:
+        db.close()
+        engine.dispose()
+    elapsed = time.perf_counter() - start
+
+    return ReplayResult(count, trades, digest.hexdigest(), elapsed)
+
+
+def _report(label: str, result: ReplayResult):
+    rate = result.events / result.elapsed * 60 if result.elapsed else float("inf")
+    trades = "" if result.trades is None else f", {len(result.trades)} trades"
+    print(
+        f"{label}: {result.events} events{trades} in {result.elapsed:.3f}s "
+        f"({rate:,.0f} events/min), digest {result.digest}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded order flow through the matcher.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Replay an event file")
+    run_parser.add_argument("path")
+    run_parser.add_argument("--expect-digest", default=None, help="Fail unless the trade digest matches")
+    run_parser.add_argument(
+        "--stp",
+        choices=[mode.value for mode in SelfTradePrevention],
+        default=DEFAULT_STP.value,
+        help="Self-trade prevention mode",
+    )
+    run_parser.add_argument(
+        "--verify-orm",
+        action="store_true",
+        help="Also replay through OrderBook on in-memory SQLite and compare trades",
+    )
+
+    generate_parser = subparsers.add_parser("generate", help="Write a random event file")
+    generate_parser.add_argument("count", type=int)
+    generate_parser.add_argument("path")
+    generate_parser.add_argument("--commodities", type=int, default=1)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.add_argument("--stop-ratio", type=float, default=0.0, help="Share of stop orders")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        write_events(args.path, generate_events(
+            args.count, commodities=args.commodities, seed=args.seed, stop_ratio=args.stop_ratio,
+        ))
+        print(f"Wrote {args.count} events to {args.path}")
+        return 0
+
+    events = list(read_events(args.path))
+    stp = SelfTradePrevention(args.stp)
+    result = replay(events, collect_trades=args.verify_orm, stp=stp)
+    _report("in-memory", result)
+
+    status = 0
+    if args.expect_digest and result.digest != args.expect_digest:
+        print(f"Digest mismatch: expected {args.expect_digest}", file=sys.stderr)
+        status = 1
+
+    if args.verify_orm:
+        orm_result = replay_through_order_book(events, stp)
+        _report("order book", orm_result)
+        if orm_result.trades != result.trades:
+            for index, (expected, actual) in enumerate(zip(orm_result.trades, result.trades)):
+                if expected != actual:
+                    print(f"First divergence at trade {index}: {expected} != {actual}", file=sys.stderr)
+                    break
+            else:
+                print("Trade counts differ", file=sys.stderr)
+            status = 1
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
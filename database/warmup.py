@@ -0,0 +1,128 @@
+"""Startup warm-up: create tables, build the in-memory books and load the
+reference data cache before serving.
+
+``warm_up`` is idempotent and thread-safe; the first caller does the work and
+later callers return the recorded status. The status (with per-phase
+timings) is served by ``GET /api/health``.
+
+When ``CHECKPOINT_PATH`` is set the books are restored from that checkpoint
+file (falling back to the database if it is missing or unreadable) and a
+background thread rewrites it every ``CHECKPOINT_INTERVAL`` seconds.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+
+from database.books import books
+from database.checkpoint import CHECKPOINT_PATH, Checkpointer, CheckpointError, recover
+from database.db import SessionLocal, init_db
+from database.reference import reference
+
+# Measured from the first import of this module, which app.py does early
+_process_started = time.perf_counter()
+
+_lock = threading.Lock()
+_checkpointer = None
+_status: Dict = {
+    "ready": False,
+    "ready_at": None,
+    "startup_ms": None,
+    "timings_ms": {},
+    "books": 0,
+    "resting_orders": 0,
+    "pending_stops": 0,
+    "reference_data": None,
+    "book_source": None,
+    "recovery": None,
+}
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def is_ready() -> bool:
+    return _status["ready"]
+
+
+def status() -> Dict:
+    return dict(_status, timings_ms=dict(_status["timings_ms"]))
+
+
+def start_checkpointer():
+    """Start the background checkpoint thread if ``CHECKPOINT_PATH`` is set.
+
+    Does nothing if the thread is already running in this process. Threads do
+    not survive ``fork``, so a forked server worker calls this again.
+    """
+    global _checkpointer
+
+    if CHECKPOINT_PATH and (_checkpointer is None or not _checkpointer.is_alive()):
+        _checkpointer = Checkpointer(books, CHECKPOINT_PATH)
+        _checkpointer.start()
+
+
+def warm_up(checkpoint: bool = True) -> Dict:
+    """Run the warm-up phases once and return the readiness status.
+
+    ``checkpoint=False`` leaves the checkpoint thread to the caller, e.g. a
+    pre-forking server that warms up in its master process.
+    """
+    if _status["ready"]:
+        return status()
+
+    with _lock:
+        if _status["ready"]:
+            return status()
+
+        start = time.perf_counter()
+        init_db()
+        _status["timings_ms"]["init_db"] = _elapsed_ms(start)
+
+        phase = time.perf_counter()
+        db = SessionLocal()
+        try:
+            if CHECKPOINT_PATH and os.path.exists(CHECKPOINT_PATH):
+                try:
+                    _status["recovery"] = recover(db, books, CHECKPOINT_PATH)
+                    _status["book_source"] = "checkpoint"
+                except CheckpointError as e:
+                    logging.error("Checkpoint recovery error: %s", str(e))
+            if _status["book_source"] is None:
+                books.load(db)
+                _status["book_source"] = "database"
+            # Stop orders are not checkpointed; they always come from the database
+            _status["pending_stops"] = books.load_triggers(db)
+        finally:
+            db.close()
+            SessionLocal.remove()
+        _status["resting_orders"] = sum(len(book) for _, book in books.items())
+        _status["timings_ms"]["load_books"] = _elapsed_ms(phase)
+
+        phase = time.perf_counter()
+        db = SessionLocal()
+        try:
+            _status["reference_data"] = reference.load(db)
+        finally:
+            db.close()
+            SessionLocal.remove()
+        _status["timings_ms"]["load_reference"] = _elapsed_ms(phase)
+
+        if checkpoint:
+            start_checkpointer()
+
+        _status["timings_ms"]["total"] = _elapsed_ms(start)
+        _status["books"] = len(books)
+        _status["startup_ms"] = _elapsed_ms(_process_started)
+        _status["ready_at"] = datetime.utcnow().isoformat()
+        _status["ready"] = True
+
+        logging.info(
+            "Warm-up complete in %.1f ms: %d books, %d resting orders",
+            _status["timings_ms"]["total"], _status["books"], _status["resting_orders"],
+        )
+        return status()
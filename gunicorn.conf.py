@@ -0,0 +1,104 @@
+"""Production gunicorn configuration.
+
+Run with::
+
+    gunicorn -c gunicorn.conf.py
+
+or ``python serve.py``. Settings come from the environment:
+
+* ``GUNICORN_WORKER_CLASS`` - ``sync``, ``gthread`` (default) or ``async``.
+  ``async`` serves the ASGI app (``asgi:app``) on uvicorn workers; the
+  others serve the Flask app (``app:app``).
+* ``WEB_CONCURRENCY`` - worker processes (default 1). In-memory books,
+  market data rings and stop triggers are per process and only mirror that
+  process's own orders, so more than one worker is refused unless
+  ``GUNICORN_ALLOW_WORKERS`` is set, e.g. for read-only benchmarks.
+* ``GUNICORN_THREADS`` - threads per ``gthread`` worker (default 8).
+* ``GUNICORN_PRELOAD`` - load and warm up the app once in the master before
+  forking (default on). Workers then share the warmed books and reference
+  cache copy-on-write and start serving immediately.
+* ``HOST``/``PORT`` or ``BIND``, ``GUNICORN_TIMEOUT``, ``GUNICORN_KEEPALIVE``,
+  ``GUNICORN_MAX_REQUESTS``.
+
+Database connections must not cross ``fork``: each worker discards the pool
+it inherited from the master (without closing the master's connections) and
+opens its own.
+"""
+
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WORKER_CLASSES = {
+    "sync": ("sync", "app:app"),
+    "gthread": ("gthread", "app:app"),
+    "async": ("uvicorn.workers.UvicornWorker", "asgi:app"),
+}
+
+_kind = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if _kind not in WORKER_CLASSES:
+    raise ValueError(
+        f"Invalid GUNICORN_WORKER_CLASS: {_kind}. Must be one of: {list(WORKER_CLASSES)}"
+    )
+_allow_workers = os.getenv("GUNICORN_ALLOW_WORKERS", "0").lower() not in ("0", "false", "no")
+
+worker_class, wsgi_app = WORKER_CLASSES[_kind]
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+threads = int(os.getenv("GUNICORN_THREADS", 8)) if _kind == "gthread" else 1
+bind = os.getenv("BIND", f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}")
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() not in ("0", "false", "no")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESSLOG")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    """Refuse several workers, which would each see only part of the order flow."""
+    if server.cfg.workers > 1 and not _allow_workers:
+        raise RuntimeError(
+            f"{server.cfg.workers} workers requested, but books, market data and stop "
+            "triggers are per process; run one worker (scale with threads or the async "
+            "worker) or set GUNICORN_ALLOW_WORKERS=1 to accept partial views"
+        )
+
+
+def when_ready(server):
+    """Warm up in the master so every worker forks with warm caches."""
+    if server.cfg.preload_app:
+        from database.warmup import warm_up
+
+        # The checkpoint thread would not survive the fork; workers start it
+        result = warm_up(checkpoint=False)
+        server.log.info(
+            "Preloaded %d books and %d resting orders in %.1f ms",
+            result["books"], result["resting_orders"], result["timings_ms"]["total"],
+        )
+
+
+def post_fork(server, worker):
+    """Give the worker its own connection pools and, if it is the only one, the checkpoint thread."""
+    import sys
+
+    from database.db import engine
+
+    # close=False: the sockets belong to the master and must stay open there
+    engine.dispose(close=False)
+    if "database.async_db" in sys.modules:
+        sys.modules["database.async_db"].async_engine.sync_engine.dispose(close=False)
+
+    from database.warmup import start_checkpointer, warm_up
+
+    # Without preload this is where the worker warms up, before its first request
+    warm_up(checkpoint=False)
+    if server.cfg.workers == 1:
+        start_checkpointer()
+    elif os.getenv("CHECKPOINT_PATH"):
+        # Each worker only mirrors its own orders, so no worker's books are complete
+        logging.warning("Book checkpoints are disabled with more than one worker")
@@ -15,6 +15,7 @@ class OrderStatus(Enum):
     PARTIAL = "partial"
     FILLED = "filled"
     CANCELLED = "cancelled"
+    PENDING = "pending"
 
 
 class Order(Base):
@@ -27,7 +28,10 @@ class Order(Base):
     status = Column(
         SQLEnum(OrderStatus), default=OrderStatus.OPEN, nullable=False
     )
-    price = Column(Float, nullable=False)
+    # Limit price; NULL for a stop-market order
+    price = Column(Float, nullable=True)
+    # Stop orders stay PENDING until the last trade price reaches stop_price
+    stop_price = Column(Float, nullable=True)
     quantity = Column(Float, nullable=False)
     filled_quantity = Column(Float, default=0.0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -50,6 +54,7 @@ class Order(Base):
             "order_type": self.order_type.value,
             "status": self.status.value,
             "price": self.price,
+            "stop_price": self.stop_price,
             "quantity": self.quantity,
             "filled_quantity": self.filled_quantity,
             "created_at": self.created_at.isoformat(),
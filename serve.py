@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+"""Production launcher: runs gunicorn with ``gunicorn.conf.py``.
+
+Extra arguments are passed through to gunicorn, e.g.::
+
+    python serve.py
+    GUNICORN_WORKER_CLASS=async python serve.py
+    python serve.py --threads 16 --bind 0.0.0.0:8000
+
+Use ``python app.py`` for the development server.
+"""
+
+import os
+import sys
+
+from gunicorn.app.wsgiapp import run
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+
+if __name__ == "__main__":
+    # Imports such as "app:app" resolve against the project directory
+    os.chdir(os.path.dirname(CONFIG))
+    sys.argv = ["gunicorn", "-c", CONFIG] + sys.argv[1:]
+    sys.exit(run())
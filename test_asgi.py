@@ -0,0 +1,134 @@
+"""The ASGI app answers exactly like the Flask app."""
+
+import asyncio
+import json
+
+from conftest import reset_app_db
+
+# Differ between runs by design
+VOLATILE = {"api_key", "seq", "created_at", "updated_at", "executed_at", "timestamp"}
+
+
+def normalize(value):
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items() if k not in VOLATILE}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    return value
+
+
+async def scenario(request):
+    """Drive an app through registration, order entry, a cross and a cancel.
+
+    ``request(method, path, body, api_key)`` returns ``(status, json)``.
+    """
+    transcript = []
+
+    async def call(method, path, body=None, api_key=None):
+        status, payload = await request(method, path, body, api_key)
+        # The query string carries a sequence number
+        transcript.append((method, path.partition("?")[0], status, normalize(payload)))
+        return payload
+
+    alice = (await call("POST", "/api/customers", {
+        "name": "Alice", "email": "alice@example.com", "password": "alice-password",
+    }))["api_key"]
+    bob = (await call("POST", "/api/customers", {
+        "name": "Bob", "email": "bob@example.com", "password": "bob-password",
+    }))["api_key"]
+    await call("POST", "/api/login", {"email": "bob@example.com", "password": "wrong"})
+
+    ask = await call("POST", "/api/orders", {
+        "commodity_id": 1, "order_type": "sell", "price": 100.0, "quantity": 5.0,
+    }, alice)
+    await call("POST", "/api/orders", {
+        "commodity_id": 1, "order_type": "buy", "price": 101.0, "quantity": 3.0,
+    }, bob)
+    await call("POST", "/api/orders", {
+        "commodity_id": 1, "order_type": "buy", "price": 101.0, "quantity": -1.0,
+    }, bob)
+    await call("POST", "/api/orders", {"commodity_id": 1, "order_type": "hold", "quantity": 1.0}, bob)
+    await call("POST", "/api/commodities", {"name": "Copper"}, bob)
+
+    await call("GET", "/api/trades", api_key=bob)
+    snapshot = await call("GET", "/api/orderbook/1/updates", api_key=bob)
+    await call("DELETE", f"/api/orders/{ask['order']['id']}", api_key=alice)
+    await call("DELETE", f"/api/orders/{ask['order']['id']}", api_key=bob)
+    await call("GET", f"/api/orderbook/1/updates?since={snapshot['seq']}", api_key=bob)
+    await call("GET", "/api/orderbook/999/updates", api_key=bob)
+    await call("GET", "/api/orders", api_key=alice)
+    return transcript
+
+
+def flask_transcript():
+    from app import app
+
+    client = app.test_client()
+
+    async def request(method, path, body, api_key):
+        headers = {"X-API-Key": api_key} if api_key else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json()
+
+    return asyncio.run(scenario(request))
+
+
+def asgi_transcript():
+    from api.asgi import create_app
+    from database.async_db import async_engine
+
+    app = create_app()
+
+    async def request(method, path, body, api_key):
+        path, _, query = path.partition("?")
+        headers = [(b"content-type", b"application/json")]
+        if api_key:
+            headers.append((b"x-api-key", api_key.encode()))
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "root_path": "", "headers": headers,
+            "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+        }
+        received = False
+        messages = []
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {"type": "http.disconnect"}
+            received = True
+            return {"type": "http.request", "body": json.dumps(body).encode() if body else b""}
+
+        async def send(message):
+            messages.append(message)
+
+        await app(scope, receive, send)
+        status = messages[0]["status"]
+        payload = b"".join(m.get("body", b"") for m in messages[1:])
+        return status, json.loads(payload)
+
+    async def run():
+        try:
+            return await scenario(request)
+        finally:
+            # Pooled connections belong to this event loop
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_asgi_matches_flask(app_db):
+    expected = flask_transcript()
+    reset_app_db()
+    actual = asgi_transcript()
+
+    assert [status for *_, status, _ in expected] == [
+        201, 201, 401, 201, 201, 400, 400, 400, 200, 200, 200, 404, 200, 404, 200,
+    ]
+    trades = expected[8][3]
+    assert [(t["price"], t["quantity"]) for t in trades] == [(100.0, 3.0)]
+    assert [event["action"] for event in expected[12][3]["events"]] == ["delete", "delete"]
+    for flask_step, asgi_step in zip(expected, actual):
+        assert asgi_step == flask_step
+    assert len(actual) == len(expected)
@@ -0,0 +1,82 @@
+"""Order book checkpoints: file round trip, corrupt files and recovery."""
+
+import pytest
+
+from conftest import submit
+from database.books import BookRegistry
+from database.checkpoint import (
+    HEADER, CheckpointError, read_checkpoint, recover, write_checkpoint,
+)
+from models import OrderType
+
+
+def seed(order_book):
+    orders = [
+        submit(order_book, 1, OrderType.BUY, 5.0, price=99.0)[0],
+        submit(order_book, 2, OrderType.BUY, 3.0, price=99.0)[0],
+        submit(order_book, 1, OrderType.SELL, 4.0, price=101.0)[0],
+        submit(order_book, 2, OrderType.SELL, 6.0, price=102.0)[0],
+        submit(order_book, 3, OrderType.BUY, 10.0, price=20.0, commodity_id=2)[0],
+    ]
+    # Leaves the 101 ask partially filled
+    submit(order_book, 3, OrderType.BUY, 1.0, price=101.0)
+    return orders
+
+
+def entries(registry):
+    return {commodity_id: book.entries() for commodity_id, book in registry.items()}
+
+
+def test_round_trip(db, order_book, tmp_path):
+    seed(order_book)
+    path = str(tmp_path / "books.ckpt")
+
+    header = write_checkpoint(db, order_book.books, path)
+    read_header, books = read_checkpoint(path)
+
+    assert read_header == header
+    assert header.records == 5 and header.commodities == 2
+    assert {cid: book.entries() for cid, book in books.items()} == entries(order_book.books)
+
+
+def test_corrupt_files(db, order_book, tmp_path):
+    seed(order_book)
+    path = tmp_path / "books.ckpt"
+    write_checkpoint(db, order_book.books, str(path))
+    data = path.read_bytes()
+
+    with pytest.raises(CheckpointError):
+        read_checkpoint(str(tmp_path / "missing.ckpt"))
+
+    for corrupt in (data[:-10], data[:HEADER.size - 1], b"NOTABOOK" + data[8:]):
+        path.write_bytes(corrupt)
+        with pytest.raises(CheckpointError):
+            read_checkpoint(str(path))
+
+
+def test_recover_applies_tail_after_watermark(db, order_book, tmp_path):
+    bid, _, _, ask, _ = seed(order_book)
+    path = str(tmp_path / "books.ckpt")
+    write_checkpoint(db, order_book.books, path)
+
+    # After the watermark: fill the rest of the 101 ask, partially fill a
+    # bid, cancel the 102 ask, add a new commodity 2 order
+    submit(order_book, 4, OrderType.BUY, 3.0, price=101.0)
+    submit(order_book, 4, OrderType.SELL, 2.0, price=99.0)
+    order_book.cancel_order(ask.id)
+    submit(order_book, 4, OrderType.SELL, 1.0, price=25.0, commodity_id=2)
+
+    recovered = BookRegistry()
+    result = recover(db, recovered, path)
+    assert result["checkpoint_records"] == 5 and result["tail_orders"] >= 4
+
+    expected = BookRegistry()
+    expected.load(db)
+    _, stale = read_checkpoint(path)
+    assert {cid: book.entries() for cid, book in stale.items()} != entries(expected)
+    assert entries(recovered) == entries(expected) == entries(order_book.books)
+    assert recovered.get(1).entries()[0][:2] == (bid.id, bid.customer_id)
+
+    # Applying the tail again changes nothing
+    recover(db, recovered, path)
+    assert entries(recovered) == entries(expected)
@@ -0,0 +1,114 @@
+"""Columnar export: dataset round trips, appends and the trade export endpoint."""
+
+import io
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from analytics.export import ENUM_CODES, FORMATS, export_table, load_table
+from conftest import add_customer, submit
+from models import OrderStatus, OrderType
+
+
+def trade(order_book, price=100.0, quantity=1.0):
+    """Cross two orders on commodity 1 at ``price``."""
+    submit(order_book, 1, OrderType.SELL, quantity, price=price)
+    submit(order_book, 2, OrderType.BUY, quantity, price=price)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_export_append_round_trip(db, order_book, tmp_path, fmt):
+    if fmt != "npy":
+        pytest.importorskip("pyarrow")
+    directory = str(tmp_path / fmt)
+    for i in range(5):
+        trade(order_book, price=100.0 + i)
+
+    manifest = export_table(db, "trades", directory, commodity_id=1, fmt=fmt, chunk_size=2)
+    assert [part["rows"] for part in manifest["parts"]] == [2, 2, 1]
+
+    for i in range(3):
+        trade(order_book, price=110.0 + i)
+    manifest = export_table(db, "trades", directory, commodity_id=1, fmt=fmt, chunk_size=2)
+    assert [part["rows"] for part in manifest["parts"]] == [2, 2, 1, 2, 1]
+    # Nothing new: no empty part is added
+    assert export_table(db, "trades", directory, commodity_id=1, fmt=fmt)["parts"] == manifest["parts"]
+
+    table = load_table(directory)
+    assert table["id"].tolist() == list(range(1, 9))
+    assert table["price"].tolist() == [100.0, 101.0, 102.0, 103.0, 104.0, 110.0, 111.0, 112.0]
+    assert (table["commodity_id"] == 1).all()
+
+
+def test_manifest_watermark_and_settings(db, order_book, tmp_path):
+    directory = str(tmp_path / "trades")
+    for i in range(3):
+        trade(order_book)
+    manifest = export_table(db, "trades", directory)
+
+    last = load_table(directory)
+    assert manifest["watermark"] == {
+        "timestamp": last["executed_at"][-1].astype(datetime).isoformat(),
+        "id": int(last["id"][-1]),
+    }
+    for changed in ({"fmt": "arrow"}, {"commodity_id": 1}):
+        with pytest.raises(ValueError, match="different settings"):
+            export_table(db, "trades", directory, **changed)
+    with pytest.raises(ValueError, match="Unknown table"):
+        export_table(db, "quotes", str(tmp_path / "quotes"))
+
+
+def test_orders_export_nulls_and_enum_codes(db, order_book, tmp_path):
+    directory = str(tmp_path / "orders")
+    submit(order_book, 1, OrderType.BUY, 2.0, price=99.0)
+    submit(order_book, 2, OrderType.SELL, 1.0, stop_price=90.0)
+    submit(order_book, 3, OrderType.SELL, 1.0, price=99.0)
+
+    manifest = export_table(db, "orders", directory)
+    table = load_table(directory)
+    assert manifest["codes"] == ENUM_CODES
+
+    by_id = {int(order_id): i for i, order_id in enumerate(table["id"])}
+    limit, stop, crossing = by_id[1], by_id[2], by_id[3]
+    assert table["price"][limit] == 99.0 and np.isnan(table["stop_price"][limit])
+    assert np.isnan(table["price"][stop]) and table["stop_price"][stop] == 90.0
+
+    decode = {column: manifest["codes"][column] for column in ("order_type", "status")}
+    assert [decode["order_type"][code] for code in table["order_type"][[limit, stop, crossing]]] == [
+        OrderType.BUY.value, OrderType.SELL.value, OrderType.SELL.value,
+    ]
+    assert [decode["status"][code] for code in table["status"][[limit, stop, crossing]]] == [
+        OrderStatus.PARTIAL.value, OrderStatus.PENDING.value, OrderStatus.FILLED.value,
+    ]
+
+
+def test_trade_export_endpoint(app_db):
+    from app import app
+    from database.books import books
+    from database.order_book import OrderBook
+    from database.matching import SelfTradePrevention
+
+    db = app_db()
+    api_key = add_customer(db)
+    order_book = OrderBook(db, SelfTradePrevention.NONE, books)
+    for i in range(3):
+        trade(order_book, price=100.0 + i)
+    app_db.remove()
+
+    client = app.test_client()
+    headers = {"X-API-Key": api_key}
+    response = client.get("/api/export/trades/1?format=npz", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == "attachment; filename=trades.npz"
+    archive = np.load(io.BytesIO(response.data))
+    assert archive["price"].tolist() == [100.0, 101.0, 102.0]
+
+    # Commodity 2 has no trades: an empty archive, not an error
+    response = client.get("/api/export/trades/2?format=npz", headers=headers)
+    assert response.status_code == 200 and np.load(io.BytesIO(response.data))["id"].size == 0
+
+    for query in ("format=csv", "format=npz&start=yesterday", "format=npz&end=2024-13-01"):
+        response = client.get(f"/api/export/trades/1?{query}", headers=headers)
+        assert response.status_code == 400 and "error" in response.get_json()
+    assert client.get("/api/export/trades/1?format=npz").status_code == 401
@@ -0,0 +1,135 @@
+"""Sequenced market data: event ring edge cases and snapshot-then-updates convergence."""
+
+import random
+import threading
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from conftest import submit
+from database.books import BookRegistry
+from database.market_data import EventRing
+from database.matching import PriceLevelBook, SelfTradePrevention
+from database.order_book import OrderBook
+from models import Commodity, OrderType
+
+
+def change(ring, order_id, remaining=1.0):
+    ring.book_changed("add", OrderType.BUY, 100.0, order_id, remaining, 0.0, remaining)
+
+
+def test_since_edge_cases():
+    ring = EventRing(1, capacity=4)
+    assert ring.since(0) == []
+
+    change(ring, 1)
+    assert [e["seq"] for e in ring.since(0)] == [1, 2]
+    assert [e["seq"] for e in ring.since(1)] == [2]
+    assert ring.since(2) == []
+    # A sequence number from the future (e.g. from before a restart)
+    assert ring.since(3) is None
+
+    # Each change is two events; the first change ages out of four slots
+    change(ring, 2)
+    change(ring, 3)
+    assert ring.seq == 6
+    assert ring.since(1) is None
+    assert [e["seq"] for e in ring.since(2)] == [3, 4, 5, 6]
+
+    # After a reset every client resyncs, even one that was up to date
+    ring.reset()
+    assert ring.since(6) is None
+    assert ring.since(ring.seq) == []
+
+
+def apply(state, events):
+    """Apply events the way a client would: quantities are absolute."""
+    for event in events:
+        if event["level"] == 3:
+            key, target = event["order_id"], state["orders"]
+        else:
+            key, target = (event["side"], event["price"]), state["levels"]
+        if event["action"] == "delete":
+            target.pop(key, None)
+        else:
+            target[key] = event["quantity"]
+
+
+def client_state(snapshot):
+    levels = {("buy", level["price"]): level["quantity"] for level in snapshot["bids"]}
+    levels.update({("sell", level["price"]): level["quantity"] for level in snapshot["asks"]})
+    return {
+        "levels": levels,
+        "orders": {o["order_id"]: o["quantity"] for o in snapshot["orders"]},
+    }
+
+
+def random_flow(book, rng, start_id, count):
+    for order_id in range(start_id, start_id + count):
+        if book.orders and rng.random() < 0.2:
+            book.cancel(rng.choice(list(book.orders)))
+        book.add(
+            order_id, rng.randint(1, 4), rng.choice((OrderType.BUY, OrderType.SELL)),
+            round(100.0 + rng.randint(-5, 5) / 10, 1), float(rng.randint(1, 10)),
+        )
+
+
+def test_snapshot_then_updates_converges():
+    registry = BookRegistry()
+    book = PriceLevelBook(1, SelfTradePrevention.NONE)
+    registry.replace({1: book})
+    rng = random.Random(11)
+
+    random_flow(book, rng, 1, 200)
+    snapshot = registry.updates(1)
+    assert snapshot["type"] == "snapshot"
+    state = client_state(snapshot)
+
+    random_flow(book, rng, 201, 200)
+    updates = registry.updates(1, since=snapshot["seq"])
+    assert updates["type"] == "updates" and updates["events"]
+    apply(state, updates["events"])
+
+    assert state == client_state(registry.updates(1))
+    # Applying the same events again is harmless
+    apply(state, updates["events"])
+    assert state == client_state(registry.updates(1))
+
+
+def test_unknown_commodity_gets_no_book(db):
+    registry = BookRegistry()
+    assert registry.get_or_load(db, 1) is not None
+    assert registry.get_or_load(db, 999) is None
+    assert [commodity_id for commodity_id, _ in registry.items()] == [1]
+
+
+def test_order_entered_during_first_load_is_in_the_book(db_path, monkeypatch):
+    Session = sessionmaker(bind=create_engine(f"sqlite:///{db_path}"))
+    with Session() as session:
+        session.add(Commodity(name="Gold", symbol="AU"))
+        session.commit()
+
+    registry = BookRegistry()
+    entered = threading.Event()
+    threads, order_ids = [], []
+
+    def enter():
+        with Session() as session:
+            order, _ = submit(OrderBook(session, SelfTradePrevention.NONE, registry), 1, OrderType.BUY, 1.0, price=100.0)
+            order_ids.append(order.id)
+        entered.set()
+
+    attach = registry._attach
+
+    def attach_after_entry(books):
+        # The open orders have been read: enter an order before the book is installed
+        threads.append(threading.Thread(target=enter))
+        threads[0].start()
+        entered.wait(timeout=0.5)
+        attach(books)
+
+    monkeypatch.setattr(registry, "_attach", attach_after_entry)
+    with Session() as session:
+        book = registry.get_or_load(session, 1)
+    threads[0].join(timeout=10)
+    assert [entry[0] for entry in book.entries()] == order_ids
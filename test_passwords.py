@@ -0,0 +1,87 @@
+"""Password pool: bounded queue, timeouts and recovery from a dead worker."""
+
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from api.passwords import RETRY_AFTER, PasswordPool, PasswordPoolBusy
+from conftest import add_customer
+
+
+def test_busy_once_queue_limit_is_taken():
+    pool = PasswordPool(workers=0, queue_limit=2)
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def hold():
+        started.release()
+        release.wait(10)
+
+    # Inline calls hold their slot for as long as they run
+    threads = [threading.Thread(target=pool.run, args=(hold,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        started.acquire()
+    with pytest.raises(PasswordPoolBusy):
+        pool.run(abs, -1)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert pool.run(abs, -1) == 1
+
+
+def test_inline_failure_releases_its_slot():
+    pool = PasswordPool(workers=0, queue_limit=1)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            pool.run(int, "not a number")
+    assert pool.run(int, "7") == 7
+
+
+def test_timeout_and_broken_worker_recovery():
+    pool = PasswordPool(workers=1, queue_limit=1, timeout=30, nice=0)
+    try:
+        # The first call waits for the worker process to start
+        assert pool.run(abs, -2) == 2
+
+        # A timed out call keeps its slot until the worker finishes it
+        pool.timeout = 0.2
+        with pytest.raises(PasswordPoolBusy, match="timed out"):
+            pool.run(time.sleep, 1.0)
+        with pytest.raises(PasswordPoolBusy, match="Too many"):
+            pool.run(abs, -2)
+        time.sleep(1.5)
+
+        pool.timeout = 30
+        broken = pool._executor
+        with pytest.raises(BrokenProcessPool):
+            pool.run(os._exit, 1)
+        # The dead pool is dropped and the next call starts a fresh one
+        assert pool._executor is None
+        assert pool.run(abs, -3) == 3
+        assert pool._executor is not broken
+    finally:
+        pool.shutdown()
+
+
+def test_login_and_registration_answer_503_when_busy(app_db, monkeypatch):
+    from api import routes
+    from app import app
+
+    add_customer(app_db())
+    app_db.remove()
+    monkeypatch.setattr(routes, "password_pool", PasswordPool(workers=0, queue_limit=0))
+    client = app.test_client()
+
+    for path, body in (
+        ("/api/login", {"email": "alice@example.com", "password": "secret"}),
+        ("/api/customers", {"name": "Bob", "email": "bob@example.com", "password": "secret"}),
+    ):
+        response = client.post(path, json=body)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(RETRY_AFTER)
+        assert "retry later" in response.get_json()["error"]
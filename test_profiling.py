@@ -0,0 +1,63 @@
+"""Sampled request profiling and its operator-only debug endpoint."""
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from api import profiling
+from database.db import engine
+
+DEBUG_KEY = "operator-secret"
+
+
+def make_app(debug_key):
+    app = Flask(__name__)
+    app.add_url_rule("/api/ping", "ping", lambda: ({"ok": True}, 200))
+    return app, profiling.init_app(app, sample_rate=1.0, debug_key=debug_key)
+
+
+@pytest.fixture
+def installed():
+    """Remove the engine listeners each profiler installs."""
+    profilers = []
+    yield profilers
+    for profiler in profilers:
+        event.remove(engine, "before_cursor_execute", profiler.before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", profiler.after_cursor_execute)
+
+
+def test_debug_endpoint_requires_a_configured_key(installed):
+    app, profiler = make_app(debug_key="")
+    installed.append(profiler)
+    client = app.test_client()
+
+    assert client.get("/api/ping").status_code == 200
+    assert "debug_profiles" not in app.view_functions
+    assert client.get("/api/debug/profiles", headers={"X-Debug-Key": DEBUG_KEY}).status_code == 404
+
+
+def test_debug_endpoint_checks_the_debug_key(installed):
+    app, profiler = make_app(debug_key=DEBUG_KEY)
+    installed.append(profiler)
+    client = app.test_client()
+    client.get("/api/ping")
+
+    for headers in ({}, {"X-Debug-Key": "wrong"}, {"X-API-Key": DEBUG_KEY}, {"X-API-Key": "customer-key"}):
+        response = client.get("/api/debug/profiles", headers=headers)
+        assert response.status_code == 401
+        assert "profiles" not in response.get_json()
+
+    response = client.get("/api/debug/profiles", headers={"X-Debug-Key": DEBUG_KEY})
+    assert response.status_code == 200
+    assert [p["path"] for p in response.get_json()["profiles"]["ping"]] == ["/api/ping"]
+
+
+def test_unmatched_urls_are_not_profiled(installed):
+    app, profiler = make_app(debug_key=DEBUG_KEY)
+    installed.append(profiler)
+    client = app.test_client()
+
+    for i in range(50):
+        assert client.get(f"/api/no-such-route-{i}").status_code == 404
+    client.get("/api/ping")
+    assert list(profiler.store.get()) == ["ping"]
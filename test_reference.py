@@ -0,0 +1,77 @@
+"""Reference data cache: invalidation, racing reloads, expiry and other processes."""
+
+import json
+import time
+
+from conftest import add_customer
+from database.reference import ReferenceCache
+from models import Commodity
+
+
+def names(payload):
+    return [c["name"] for c in json.loads(payload)]
+
+
+def test_commodity_post_invalidates_the_list(app_db):
+    from app import app
+
+    api_key = add_customer(app_db())
+    app_db.remove()
+    client = app.test_client()
+    headers = {"X-API-Key": api_key}
+
+    assert [c["name"] for c in client.get("/api/commodities", headers=headers).get_json()] == ["Gold", "Silver"]
+    response = client.post("/api/commodities", json={"name": "Copper", "symbol": "CU"}, headers=headers)
+    assert response.status_code == 201
+    assert [c["name"] for c in client.get("/api/commodities", headers=headers).get_json()] == [
+        "Gold", "Silver", "Copper",
+    ]
+    assert client.get("/api/commodities/3", headers=headers).get_json()["symbol"] == "CU"
+
+
+def test_reload_racing_an_invalidation_is_not_stored(db, monkeypatch):
+    cache = ReferenceCache()
+    to_dict = Commodity.to_dict
+    raced = []
+
+    def to_dict_during_create(commodity):
+        # Another request creates a commodity while this reload is reading
+        if not raced:
+            raced.append(True)
+            db.add(Commodity(name="Copper", symbol="CU"))
+            db.commit()
+            cache.invalidate_commodities()
+        return to_dict(commodity)
+
+    monkeypatch.setattr(Commodity, "to_dict", to_dict_during_create)
+    stale = cache.load_commodities(db)
+    monkeypatch.setattr(Commodity, "to_dict", to_dict)
+
+    assert names(stale[0]) == ["Gold", "Silver"]
+    assert names(cache.commodity_list(db)) == ["Gold", "Silver", "Copper"]
+
+
+def test_entries_expire_after_ttl(db, monkeypatch):
+    cache = ReferenceCache(ttl=60)
+    assert names(cache.commodity_list(db)) == ["Gold", "Silver"]
+
+    # Created without invalidating this cache, e.g. by another process
+    db.add(Commodity(name="Copper", symbol="CU"))
+    db.commit()
+    assert names(cache.commodity_list(db)) == ["Gold", "Silver"]
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert names(cache.commodity_list(db)) == ["Gold", "Silver", "Copper"]
+
+
+def test_commodity_created_by_another_process(db):
+    cache = ReferenceCache(ttl=60)
+    assert cache.commodity(db, 3) is None
+
+    db.add(Commodity(name="Copper", symbol="CU"))
+    db.commit()
+    assert json.loads(cache.commodity(db, 3))["name"] == "Copper"
+    # The reload also refreshed the list
+    assert names(cache.commodity_list(db)) == ["Gold", "Silver", "Copper"]
+    assert cache.commodity(db, 999) is None
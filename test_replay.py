@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Tests for the in-memory matching engine and the order-flow replay tool
+The in-memory book must produce exactly the trades of the database-backed OrderBook
+"""
+
+import pytest
+
+from database.matching import PriceLevelBook, SelfTradePrevention
+from database.replay import generate_events, replay, replay_through_order_book
+from models import OrderType
+
+
+def test_replay_is_deterministic():
+    """Replaying the same events twice yields the same trade digest."""
+    events = list(generate_events(2000, commodities=2, seed=7))
+    first = replay(events)
+    second = replay(events)
+    assert first.digest == second.digest
+
+
+@pytest.mark.parametrize("stp", list(SelfTradePrevention))
+def test_replay_matches_order_book(stp):
+    """The in-memory engine and OrderBook agree trade for trade in every STP mode."""
+    events = list(generate_events(300, commodities=2, customers=3, seed=3))
+    result = replay(events, collect_trades=True, stp=stp)
+    orm_result = replay_through_order_book(events, stp)
+    assert result.trades
+    assert result.trades == orm_result.trades
+    assert result.digest == orm_result.digest
+
+
+@pytest.mark.parametrize("stp", list(SelfTradePrevention))
+def test_replay_with_stop_orders_matches_order_book(stp):
+    """Stop and stop-market orders trigger and fill identically in both paths."""
+    events = list(generate_events(400, commodities=2, customers=3, seed=5, stop_ratio=0.25))
+    stop_ids = {e["order_id"] for e in events if e.get("stop_price") is not None}
+    assert any(e.get("stop_price") is not None and e["price"] is None for e in events)
+
+    result = replay(events, collect_trades=True, stp=stp)
+    orm_result = replay_through_order_book(events, stp)
+    assert any(trade.order_id in stop_ids for trade in result.trades)
+    assert result.trades == orm_result.trades
+    assert result.digest == orm_result.digest
+
+
+def test_replay_rejects_order_without_prices():
+    with pytest.raises(ValueError):
+        replay([{"event": "order", "order_id": 1, "customer_id": 1, "commodity_id": 1,
+                 "order_type": "buy", "price": None, "quantity": 1.0}])
+
+
+def test_price_time_priority_and_cancel():
+    """Better prices fill first, then earlier orders at the same price."""
+    book = PriceLevelBook(1)
+    book.add(1, 1, OrderType.SELL, 101.0, 5.0)
+    book.add(2, 2, OrderType.SELL, 100.0, 5.0)
+    book.add(3, 3, OrderType.SELL, 100.0, 5.0)
+    book.cancel(3)
+
+    fills = book.add(4, 4, OrderType.BUY, 101.0, 8.0)
+    assert [(f.maker_id, f.price, f.quantity) for f in fills] == [(2, 100.0, 5.0), (1, 101.0, 3.0)]
+    assert book.snapshot()["asks"] == [{"price": 101.0, "quantity": 2.0}]
+    assert book.snapshot()["bids"] == []
+
+
+def test_self_trade_prevention_modes():
+    """A customer's order never trades against their own resting order."""
+    def book_with(stp):
+        book = PriceLevelBook(1, stp)
+        book.add(1, 1, OrderType.SELL, 100.0, 5.0)
+        book.add(2, 2, OrderType.SELL, 100.0, 5.0)
+        return book
+
+    # Incoming order is cancelled at its first self-match
+    book = book_with(SelfTradePrevention.CANCEL_NEWEST)
+    assert book.add(3, 1, OrderType.BUY, 100.0, 8.0) == []
+    assert 3 not in book and 1 in book
+
+    # Resting order is cancelled and matching continues behind it
+    book = book_with(SelfTradePrevention.CANCEL_OLDEST)
+    fills = book.add(3, 1, OrderType.BUY, 100.0, 8.0)
+    assert [(f.maker_id, f.quantity) for f in fills] == [(2, 5.0)]
+    assert 1 not in book and book.orders[3].remaining == 3.0
+
+    # Both orders shrink by the overlap without a trade
+    book = book_with(SelfTradePrevention.DECREMENT_BOTH)
+    fills = book.add(3, 1, OrderType.BUY, 100.0, 8.0)
+    assert [(f.maker_id, f.quantity) for f in fills] == [(2, 3.0)]
+    assert 1 not in book and 3 not in book and book.orders[2].remaining == 2.0
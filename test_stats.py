@@ -0,0 +1,117 @@
+"""Trade window statistics."""
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from analytics.stats import TradeWindow, realized_volatility, twap, volume_profile, vwap
+from models import Order, OrderStatus, OrderType, Trade
+
+
+def add_trades(db_path, trades):
+    """Insert (executed_at, price, quantity) trades on commodity 1."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    db = sessionmaker(bind=engine)()
+    orders = [
+        Order(customer_id=1, commodity_id=1, order_type=order_type, price=100.0, quantity=1000.0,
+              filled_quantity=0.0, status=OrderStatus.OPEN)
+        for order_type in (OrderType.BUY, OrderType.SELL)
+    ]
+    db.add_all(orders)
+    db.flush()
+    db.add_all([
+        Trade(order_id=orders[0].id, counterparty_order_id=orders[1].id,
+              price=price, quantity=quantity, executed_at=executed_at)
+        for executed_at, price, quantity in trades
+    ])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def test_statistics():
+    prices = np.array([10.0, 12.0, 11.0, 12.0])
+    quantities = np.array([1.0, 3.0, 2.0, 4.0])
+    start = np.datetime64("2024-01-01T00:00:00", "us")
+    timestamps = start + np.array([0, 10, 40, 50], dtype="timedelta64[s]")
+
+    assert vwap(prices, quantities) == pytest.approx((10 + 36 + 22 + 48) / 10)
+    # Weights 10, 30, 10 and 10 seconds up to ``end``
+    end = start + np.timedelta64(60, "s")
+    assert twap(prices, timestamps, end=end) == pytest.approx((100 + 360 + 110 + 120) / 60)
+    # The last trade carries no weight without ``end``
+    assert twap(prices, timestamps) == pytest.approx((100 + 360 + 110) / 50)
+    returns = np.log([12 / 10, 11 / 12, 12 / 11])
+    assert realized_volatility(prices) == pytest.approx(np.sqrt((returns ** 2).sum()))
+    assert volume_profile(prices, quantities) == [
+        {"price": 10.0, "volume": 1.0},
+        {"price": 11.0, "volume": 2.0},
+        {"price": 12.0, "volume": 7.0},
+    ]
+
+    empty = np.empty(0)
+    assert np.isnan(vwap(empty, empty))
+    assert np.isnan(realized_volatility(prices[:1]))
+
+
+def test_window_appends_past_watermark_and_ages_out(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    db = sessionmaker(bind=engine)()
+    now = datetime.utcnow()
+    window = TradeWindow(1, window_seconds=60)
+
+    # Trades older than the window are never loaded
+    add_trades(db_path, [(now - timedelta(seconds=90), 1.0, 1.0), (now - timedelta(seconds=30), 2.0, 1.0)])
+    window.update(db, now=now)
+    assert window.prices.tolist() == [2.0]
+    first_watermark = window.watermark
+
+    add_trades(db_path, [(now - timedelta(seconds=10), 3.0, 2.0)])
+    window.update(db, now=now)
+    assert window.prices.tolist() == [2.0, 3.0]
+    assert window.watermark[1] > first_watermark[1]
+
+    # Nothing new: the window is unchanged
+    window.update(db, now=now)
+    assert window.prices.tolist() == [2.0, 3.0]
+
+    # Later, the first trade ages out
+    window.update(db, now=now + timedelta(seconds=40))
+    assert window.prices.tolist() == [3.0]
+    stats = window.statistics(now=now + timedelta(seconds=40))
+    assert stats["trade_count"] == 1 and stats["volume"] == 2.0 and stats["last_price"] == 3.0
+    db.close()
+    engine.dispose()
+
+
+def test_concurrent_updates_under_run_sync(db_path):
+    """Updates sharing one event loop must not block each other's thread."""
+    now = datetime.utcnow()
+    add_trades(db_path, [(now - timedelta(seconds=i), 100.0 + i, 1.0) for i in range(50)])
+    window = TradeWindow(1)
+    result = {}
+
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        Session = sessionmaker(engine, class_=AsyncSession)
+
+        async def update():
+            async with Session() as session:
+                await session.run_sync(window.update)
+
+        await asyncio.gather(*[update() for _ in range(8)])
+        await engine.dispose()
+        result["count"] = len(window.prices)
+
+    thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    thread.start()
+    thread.join(timeout=20)
+    assert not thread.is_alive(), "concurrent updates deadlocked"
+    # Overlapping fetches are appended once
+    assert result["count"] == 50
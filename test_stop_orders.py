@@ -0,0 +1,93 @@
+"""Stop and stop-limit orders: trigger book and OrderBook activation."""
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from conftest import submit
+from database.db import migrate_db
+from database.matching import TriggerBook
+from models import Order, OrderStatus, OrderType, Trade
+
+def test_trigger_book_pops_only_triggered_range():
+    triggers = TriggerBook(1)
+    for order_id, stop in enumerate([101.0, 103.0, 102.0, 105.0], 1):
+        triggers.add(order_id, OrderType.BUY, stop)
+    triggers.add(5, OrderType.SELL, 99.0)
+    triggers.add(6, OrderType.SELL, 97.0)
+    triggers.cancel(3)
+
+    assert triggers.on_trades([100.0]) == []
+    assert triggers.on_trades([102.5, 103.0]) == [1, 2]
+    assert triggers.last_price == 103.0
+    assert triggers.on_trades([98.0]) == [5]
+    assert sorted(triggers.pending) == [4, 6]
+
+
+def test_stop_limit_activates_in_the_same_pass(order_book):
+    submit(order_book, 1, OrderType.SELL, 10.0, price=101.0)
+    stop, trades = submit(order_book, 2, OrderType.BUY, 5.0, price=102.0, stop_price=101.0)
+    assert stop.status == OrderStatus.PENDING and trades == []
+
+    # A trade below the stop leaves it pending
+    submit(order_book, 3, OrderType.SELL, 1.0, price=100.0)
+    submit(order_book, 4, OrderType.BUY, 1.0, price=100.0)
+    assert order_book.db.get(Order, stop.id).status == OrderStatus.PENDING
+
+    # A trade at the stop triggers it against the remaining offer
+    _, trades = submit(order_book, 4, OrderType.BUY, 1.0, price=101.0)
+    assert [t.price for t in trades] == [101.0]
+    stop = order_book.db.get(Order, stop.id)
+    assert stop.status == OrderStatus.FILLED and stop.filled_quantity == 5.0
+    assert order_book.db.query(Trade).filter(Trade.order_id == stop.id).count() == 1
+
+
+def test_stop_market_and_cancel(order_book):
+    submit(order_book, 1, OrderType.BUY, 3.0, price=99.0)
+    submit(order_book, 1, OrderType.SELL, 1.0, price=100.0)
+    submit(order_book, 2, OrderType.BUY, 1.0, price=100.0)
+
+    # Last price 100 is already at or below the stop: fills at once, remainder cancelled
+    order, trades = submit(order_book, 3, OrderType.SELL, 5.0, stop_price=100.0)
+    assert [(t.price, t.quantity) for t in trades] == [(99.0, 3.0)]
+    assert order.status == OrderStatus.CANCELLED and order.filled_quantity == 3.0
+
+    pending, _ = submit(order_book, 3, OrderType.SELL, 5.0, stop_price=90.0)
+    assert pending.id in order_book.books.triggers(order_book.db, 1)
+    assert order_book.cancel_order(pending.id).status == OrderStatus.CANCELLED
+    assert pending.id not in order_book.books.triggers(order_book.db, 1)
+
+
+def test_migrate_db_from_pre_stop_schema(tmp_path):
+    """Databases created before stop orders gain stop_price and a nullable price."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("""
+            CREATE TABLE orders (
+                id INTEGER NOT NULL, customer_id INTEGER NOT NULL, commodity_id INTEGER NOT NULL,
+                order_type VARCHAR(4) NOT NULL, status VARCHAR(9) NOT NULL, price FLOAT NOT NULL,
+                quantity FLOAT NOT NULL, filled_quantity FLOAT NOT NULL,
+                created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL, PRIMARY KEY (id)
+            )
+        """)
+        conn.exec_driver_sql("""
+            INSERT INTO orders VALUES
+                (1, 1, 1, 'BUY', 'OPEN', 99.5, 2.0, 0.0, '2024-01-01 00:00:00', '2024-01-01 00:00:00'),
+                (2, 2, 1, 'SELL', 'PARTIAL', 101.0, 3.0, 1.0, '2024-01-01 00:00:01', '2024-01-01 00:00:02')
+        """)
+
+    assert migrate_db(engine) == ["add orders.stop_price", "make orders.price nullable"]
+    assert migrate_db(engine) == []
+
+    db = sessionmaker(bind=engine)()
+    orders = db.query(Order).order_by(Order.id).all()
+    assert [(o.price, o.stop_price, o.status, o.filled_quantity) for o in orders] == [
+        (99.5, None, OrderStatus.OPEN, 0.0),
+        (101.0, None, OrderStatus.PARTIAL, 1.0),
+    ]
+    db.add(Order(
+        customer_id=1, commodity_id=1, order_type=OrderType.BUY, price=None, stop_price=105.0,
+        quantity=1.0, filled_quantity=0.0, status=OrderStatus.PENDING,
+    ))
+    db.commit()
+    db.close()
+    engine.dispose()
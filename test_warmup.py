@@ -0,0 +1,65 @@
+"""Startup warm-up: idempotence, readiness reporting and checkpoint fallback."""
+
+import pytest
+
+from conftest import add_customer
+from database import warmup
+from models import Order, OrderStatus, OrderType
+
+
+@pytest.fixture
+def cold(app_db, monkeypatch):
+    """A process that has not warmed up yet."""
+    monkeypatch.setattr(warmup, "_status", dict(
+        warmup._status, ready=False, timings_ms={}, book_source=None, recovery=None,
+    ))
+    return app_db
+
+
+def test_warm_up_runs_once(cold, monkeypatch):
+    calls = []
+    init_db = warmup.init_db
+    monkeypatch.setattr(warmup, "init_db", lambda: calls.append(1) or init_db())
+
+    first = warmup.warm_up(checkpoint=False)
+    second = warmup.warm_up(checkpoint=False)
+    assert calls == [1]
+    assert first == second and first["ready"] and first["book_source"] == "database"
+
+
+def test_health_reports_503_until_warm(cold):
+    from app import app
+
+    api_key = add_customer(cold())
+    cold.remove()
+    client = app.test_client()
+
+    # The health check does not trigger the warm-up, it reports on it
+    for _ in range(2):
+        response = client.get("/api/health")
+        assert response.status_code == 503 and response.get_json()["ready"] is False
+    assert not warmup.is_ready()
+
+    # Any other request warms up first
+    assert client.get("/api/commodities", headers={"X-API-Key": api_key}).status_code == 200
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    assert response.get_json()["ready"] is True and response.get_json()["books"] == 2
+
+
+def test_corrupt_checkpoint_falls_back_to_database(cold, monkeypatch, tmp_path):
+    db = cold()
+    db.add(Order(
+        customer_id=1, commodity_id=1, order_type=OrderType.BUY, price=99.0,
+        quantity=1.0, filled_quantity=0.0, status=OrderStatus.OPEN,
+    ))
+    db.commit()
+    cold.remove()
+    path = tmp_path / "books.ckpt"
+    path.write_bytes(b"not a checkpoint")
+    monkeypatch.setattr(warmup, "CHECKPOINT_PATH", str(path))
+
+    result = warmup.warm_up(checkpoint=False)
+    assert result["ready"] is True
+    assert result["book_source"] == "database" and result["recovery"] is None
+    assert result["resting_orders"] == 1